@@ -0,0 +1,308 @@
+# ==============================================================================
+# BENCHMARK JALUR PANAS PERHITUNGAN HARGA
+# Jalankan dari root repo:
+#   python benchmarks/bench_pricing.py                   # ukur & bandingkan dengan baseline
+#   python benchmarks/bench_pricing.py --save-baseline   # simpan hasil sebagai baseline baru
+#   python benchmarks/bench_pricing.py --quick --scales 1,10
+#   python benchmarks/bench_pricing.py --require-baseline  # untuk CI: gagal bila baseline tidak ada
+#
+# Semua kasus berjalan offline terhadap pricing_core: data lokal dt/*.csv, salinan
+# sintetis yang diperbesar 10x/100x, JSON mobil sintetis (jalur pembersihan Drive),
+# dan payload SerpAPI tetap dari benchmarks/fixtures/serpapi_payloads.json. Latensi dilaporkan sebagai p50/p95/p99, memori sebagai puncak
+# alokasi tracemalloc. Exit code 1 jika ada kasus yang lebih lambat/boros dari baseline.
+# ==============================================================================
+
+import argparse
+import dataclasses
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pricing_core as core  # noqa: E402
+
+DEFAULT_BASELINE_PATH = os.path.join(ROOT, "benchmarks", "baseline.json")
+SERPAPI_FIXTURE_PATH = os.path.join(ROOT, "benchmarks", "fixtures", "serpapi_payloads.json")
+
+# --- Data Sintetis ---
+def scale_frame(df, factor, key_col, price_cols, seed=0):
+    """
+    Memperbanyak df sebanyak factor kali. Tiap salinan mendapat sufiks pada kolom kunci
+    (kombinasi tetap unik) dan harga yang digeser acak +-10% agar tidak identik.
+    """
+    if factor == 1:
+        return df
+    rng = np.random.default_rng(seed)
+    parts = [df]
+    for k in range(1, factor):
+        part = df.copy()
+        part[key_col] = part[key_col].astype(str) + f" s{k}"
+        for col in price_cols:
+            part[col] = (part[col] * rng.uniform(0.9, 1.1, len(part))).round()
+        parts.append(part)
+    return pd.concat(parts, ignore_index=True)
+
+def synthetic_car_json(avg_raw, factor, path, seed=0):
+    """
+    JSON mobil sintetis berformat seperti file Drive (angka sebagai teks berkoma ribuan),
+    diturunkan dari dt/avg.csv lalu diperbesar factor kali.
+    """
+    rng = np.random.default_rng(seed)
+    base = avg_raw.rename(columns={"vehicleModelDate": "tahun", "avg_price": "output"})
+    base = scale_frame(base, factor, "varian", ["output"], seed)
+    output = base["output"].to_numpy(dtype=np.float64)
+    cars = pd.DataFrame({col: base[col] for col in ("name", "model", "varian", "tahun")})
+    for col in core.CAR_SCHEMA.numeric_cols:
+        values = output if col == "output" else output * rng.uniform(0.5, 1.6, len(output))
+        cars[col] = [f"{v:,.0f}" for v in values]
+    cars.to_json(path, orient="records")
+    return len(cars)
+
+def load_serpapi_payloads(path=SERPAPI_FIXTURE_PATH):
+    """
+    Payload berformat respons SerpAPI (campuran format harga, iklan baru, dan cuplikan
+    tanpa harga) dari fixture yang di-commit. Isinya sengaja tetap agar p50 kasus ekstraksi
+    bisa dibandingkan dengan baseline; ubah fixture hanya bersamaan dengan baseline baru.
+    """
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def payload_product_name(payload):
+    """Nama produk perkiraan dari query SerpAPI (kata sebelum operator pencarian pertama)."""
+    query = payload.get("search_parameters", {}).get("q", "")
+    return query.split("(")[0].replace("jual ", "", 1).strip()
+
+def bench_snapshot(df_mobil, car_index, car_fuzzy, car_prices, car_depreciation, df_motor):
+    """DatasetSnapshot seperti hasil DatasetRegistry._publish, dari tabel yang sudah disiapkan benchmark."""
+    return core.DatasetSnapshot(
+        version=1,
+        car_revision="bench",
+        df_mobil=df_mobil,
+        df_motor=df_motor,
+        car_index=car_index,
+        motor_index=core.build_lookup_index(df_motor, core.MOTOR_SCHEMA.key_cols, core.MOTOR_SCHEMA.year_col),
+        car_fuzzy=car_fuzzy,
+        motor_fuzzy=core.FuzzyVehicleIndex(df_motor, core.MOTOR_SCHEMA),
+        car_prices=car_prices,
+        motor_prices=core.GradePriceMatrix.build(df_motor["output"], core.resolve_grade_factors()),
+        car_depreciation=car_depreciation,
+        motor_depreciation=core.DepreciationModel.fit(df_motor, core.MOTOR_SCHEMA),
+    )
+
+# --- Pengukuran ---
+@dataclasses.dataclass
+class BenchResult:
+    name: str
+    repeat: int
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    peak_kib: float
+    ops: int = 1
+
+    @property
+    def per_op_us(self):
+        return self.p50_ms * 1000 / self.ops
+
+def measure(name, fn, repeat, warmup=1, ops=1):
+    """Menjalankan fn berulang; latensi per iterasi (ms) dan puncak memori satu iterasi terpisah."""
+    for _ in range(warmup):
+        fn()
+    timings = np.empty(repeat)
+    gc.collect()
+    for i in range(repeat):
+        start = time.perf_counter_ns()
+        fn()
+        timings[i] = (time.perf_counter_ns() - start) / 1e6
+    # Memori diukur di luar loop waktu karena tracemalloc memperlambat alokasi
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    p50, p95, p99 = np.percentile(timings, [50, 95, 99])
+    return BenchResult(name, repeat, float(p50), float(p95), float(p99), peak / 1024, ops)
+
+# --- Daftar Kasus ---
+def build_cases(workdir, scales, quick):
+    """Menyiapkan data per skala dan mengembalikan daftar (nama, fungsi, repeat, ops)."""
+    r = (lambda n: max(3, n // 5)) if quick else (lambda n: n)
+    mtr_raw = pd.read_csv(os.path.join(ROOT, "dt", "mtr.csv"), encoding="utf-8-sig")
+    avg_raw = pd.read_csv(os.path.join(ROOT, "dt", "avg.csv"), encoding="utf-8-sig")
+    mtr_prices = [c for c in mtr_raw.columns if c not in ("brand", "variant", "year")]
+    cases = []
+
+    for factor in scales:
+        tag = f"x{factor}"
+        heavy = max(1, factor // 10)
+        mtr_path = os.path.join(workdir, f"mtr_{tag}.csv")
+        avg_path = os.path.join(workdir, f"avg_{tag}.csv")
+        car_path = os.path.join(workdir, f"mobil_{tag}.json")
+        scale_frame(mtr_raw, factor, "variant", mtr_prices).to_csv(mtr_path, index=False)
+        scale_frame(avg_raw, factor, "varian", ["avg_price"]).to_csv(avg_path, index=False)
+        synthetic_car_json(avg_raw, factor, car_path)
+        mtr_schema = dataclasses.replace(core.MOTOR_SCHEMA, name=f"bench_mtr_{tag}")
+        avg_schema = dataclasses.replace(core.AVG_SCHEMA, name=f"bench_avg_{tag}")
+
+        cases += [
+            (f"read_csv_with_schema[mtr {tag}]", lambda p=mtr_path, s=mtr_schema: core.read_csv_with_schema(p, s), r(20 // heavy), 1),
+            (f"read_csv_with_schema[avg {tag}]", lambda p=avg_path, s=avg_schema: core.read_csv_with_schema(p, s), r(20 // heavy), 1),
+            # Panggilan pertama menulis snapshot; pengukuran berikutnya membaca Feather memory-mapped
+            (f"load_local_data snapshot[mtr {tag}]", lambda p=mtr_path, s=mtr_schema: core.load_local_data(p, s), r(50 // heavy), 1),
+            (f"car json clean[{tag}]", lambda p=car_path: core.compact_dtypes(
+                core.apply_schema(pd.read_json(p, encoding="utf-8-sig"), core.CAR_SCHEMA), core.CAR_SCHEMA), r(10 // heavy), 1),
+        ]
+
+        df_mobil = core.compact_dtypes(core.apply_schema(pd.read_json(car_path), core.CAR_SCHEMA), core.CAR_SCHEMA)
+        df_avg = core.read_csv_with_schema(avg_path, avg_schema)
+        cases += [
+            (f"build_lookup_index[mobil {tag}]", lambda df=df_mobil: core.build_lookup_index(df, core.CAR_SCHEMA.key_cols, core.CAR_SCHEMA.year_col), r(20 // heavy), 1),
+            (f"FuzzyVehicleIndex build[mobil {tag}]", lambda df=df_mobil: core.FuzzyVehicleIndex(df, core.CAR_SCHEMA), r(10 // heavy), 1),
+            (f"attach_market_average[mobil {tag}]", lambda df=df_mobil, a=df_avg: core.attach_market_average(df.copy(), a), r(20 // heavy), 1),
+            (f"GradePriceMatrix build[mobil {tag}]", lambda df=df_mobil: core.GradePriceMatrix.build(df["output"], core.resolve_grade_factors()), r(100), 1),
+            (f"DepreciationModel fit[mobil {tag}]", lambda df=df_mobil: core.DepreciationModel.fit(df, core.CAR_SCHEMA), r(20 // heavy), 1),
+        ]
+
+        # Lookup seperti di panel mobil: opsi tiap level selectbox dari snapshot lalu posisi baris
+        index = core.build_lookup_index(df_mobil, core.CAR_SCHEMA.key_cols, core.CAR_SCHEMA.year_col)
+        fuzzy = core.FuzzyVehicleIndex(df_mobil, core.CAR_SCHEMA)
+        prices = core.GradePriceMatrix.build(df_mobil["output"], core.resolve_grade_factors())
+        depreciation = core.DepreciationModel.fit(df_mobil, core.CAR_SCHEMA)
+        df_motor = core.compact_dtypes(core.read_csv_with_schema(mtr_path, mtr_schema), core.MOTOR_SCHEMA)
+        snapshot = bench_snapshot(df_mobil, index, fuzzy, prices, depreciation, df_motor)
+        sample = df_mobil.sample(n=min(1000, len(df_mobil)), random_state=0)
+        paths = list(zip(*(sample[col].astype(str) for col in core.CAR_SCHEMA.key_cols), sample["tahun"].astype(int)))
+
+        def cascade(snapshot=snapshot, paths=paths, cold=True):
+            # cold: memo opsi dikosongkan dulu, seperti snapshot yang baru dipublikasikan
+            if cold:
+                snapshot._option_cache.clear()
+            for brand, model, varian, year in paths:
+                snapshot.select_options("mobil")
+                snapshot.select_options("mobil", brand)
+                snapshot.select_options("mobil", brand, model)
+                snapshot.select_options("mobil", brand, model, varian)
+                core.lookup_row_position(snapshot.car_index, brand, model, varian, year)
+
+        queries = [f"{b} {m} {v[:6]}" for b, m, v, _ in paths[:50]]
+        lot = pd.DataFrame(paths, columns=["brand", "model", "varian", "tahun"]).sample(n=5000, replace=True, random_state=0)
+        lot["grade"] = np.random.default_rng(0).choice(list("ABCDE"), len(lot))
+        # Tahun yang digeser keluar dari data memaksa interpolasi/ekstrapolasi
+        modeled_paths = [((brand, model, varian), year + 3) for brand, model, varian, year in paths]
+        cases += [
+            (f"select_options cascade+lookup cold[mobil {tag}]", cascade, r(20), len(paths)),
+            (f"select_options cascade+lookup warm[mobil {tag}]", lambda c=cascade: c(cold=False), r(20), len(paths)),
+            (f"depreciation price[mobil {tag}]", lambda d=depreciation, q=modeled_paths: [d.price(k, y) for k, y in q], r(20), len(modeled_paths)),
+            (f"fuzzy search[mobil {tag}]", lambda f=fuzzy, q=queries: [f.search(x, limit=3) for x in q], r(10), len(queries)),
+            (f"price_lot 5k rows[mobil {tag}]", lambda df=df_mobil, f=fuzzy, p=prices, lot=lot: core.price_lot(lot, df, core.CAR_SCHEMA, f, p), r(10 // heavy), 1),
+        ]
+
+    payloads = load_serpapi_payloads()
+    snippets = [f"{res.get('title', '')} {res.get('snippet', '')}" for p in payloads for res in p.get("organic_results", [])]
+
+    def evidence(payloads=payloads):
+        for payload in payloads:
+            core.summarize_search_evidence(payload, payload_product_name(payload))
+
+    amounts = np.random.default_rng(0).uniform(1e5, 1e10, 100_000)
+    cases += [
+        ("extract_prices_from_text[serpapi snippets]", lambda s=snippets: [core.extract_prices_from_text(x) for x in s], r(50), len(snippets)),
+        ("extract_listing_records+context+estimate[serpapi]", evidence, r(30), len(payloads)),
+        ("format_rupiah[100k]", lambda a=amounts: [core.format_rupiah(x) for x in a], r(10), len(amounts)),
+    ]
+    return cases
+
+# --- Baseline ---
+def compare(results, baseline, tolerance):
+    """Menandai kasus yang p50 atau puncak memorinya melebihi baseline x (1 + toleransi)."""
+    rows = []
+    for result in results:
+        base = baseline.get(result.name)
+        if base is None:
+            rows.append((result, None, "baru"))
+            continue
+        slower = result.p50_ms > base["p50_ms"] * (1 + tolerance)
+        heavier = result.peak_kib > base["peak_kib"] * (1 + tolerance)
+        status = "REGRESI" if slower or heavier else "ok"
+        rows.append((result, result.p50_ms / base["p50_ms"] if base["p50_ms"] else None, status))
+    return rows
+
+def print_report(rows):
+    header = f"{'kasus':<52} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'us/op':>9} {'peak KiB':>10} {'vs base':>8}  status"
+    print(header)
+    print("-" * len(header))
+    for result, ratio, status in rows:
+        ratio_text = f"{ratio:.2f}x" if ratio is not None else "-"
+        print(
+            f"{result.name:<52} {result.p50_ms:>9.3f} {result.p95_ms:>9.3f} {result.p99_ms:>9.3f} "
+            f"{result.per_op_us:>9.2f} {result.peak_kib:>10.0f} {ratio_text:>8}  {status}"
+        )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark jalur panas perhitungan harga LEGOAS.")
+    parser.add_argument("--scales", default="1,10,100", help="Faktor skala data sintetis, dipisah koma.")
+    parser.add_argument("--quick", action="store_true", help="Iterasi lebih sedikit (untuk pemeriksaan cepat).")
+    parser.add_argument("--only", default="", help="Hanya jalankan kasus yang namanya memuat teks ini.")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="Path file baseline JSON.")
+    parser.add_argument("--save-baseline", action="store_true", help="Simpan hasil sebagai baseline baru.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Toleransi regresi relatif (0.25 = 25%%).")
+    parser.add_argument("--require-baseline", action="store_true",
+                        help="Gagal (exit 2) bila baseline tidak ada atau ada kasus yang belum punya baseline (untuk CI).")
+    args = parser.parse_args(argv)
+
+    # Diperiksa sebelum mengukur agar CI tanpa baseline langsung gagal, bukan lolos diam-diam
+    if args.require_baseline and not args.save_baseline and not os.path.exists(args.baseline):
+        print(f"Baseline {args.baseline} tidak ditemukan; jalankan --save-baseline di mesin referensi lalu commit file tersebut.")
+        return 2
+
+    scales = [int(s) for s in args.scales.split(",") if s.strip()]
+    with tempfile.TemporaryDirectory(prefix="legoas-bench-") as workdir:
+        # Snapshot benchmark ditulis ke folder sementara, bukan ke .cache/ milik aplikasi
+        core.SNAPSHOT_DIR = os.path.join(workdir, "snapshots")
+        results = [
+            measure(name, fn, repeat, ops=ops)
+            for name, fn, repeat, ops in build_cases(workdir, scales, args.quick)
+            if args.only in name
+        ]
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    rows = compare(results, baseline, args.tolerance)
+    print_report(rows)
+
+    if args.save_baseline:
+        payload = {
+            "created_at": pd.Timestamp.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "pandas": pd.__version__,
+            "results": {r.name: dataclasses.asdict(r) for r in results},
+        }
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(payload, f, indent=2)
+        print(f"\nBaseline disimpan ke {args.baseline}")
+        return 0
+    if not baseline:
+        print(f"\nBelum ada baseline di {args.baseline}; jalankan dengan --save-baseline di mesin deploy.")
+    missing = [result.name for result, _, status in rows if status == "baru"]
+    if args.require_baseline and missing:
+        print(f"\n{len(missing)} kasus belum punya baseline: {', '.join(missing)}")
+        return 2
+    regressions = [result.name for result, _, status in rows if status == "REGRESI"]
+    if regressions:
+        print(f"\n{len(regressions)} kasus melewati toleransi {args.tolerance:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
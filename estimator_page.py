@@ -0,0 +1,913 @@
+# ==============================================================================
+# HALAMAN ESTIMASI (SETELAH LOGIN)
+# ==============================================================================
+# Modul ini baru diimpor oleh app.py setelah pengguna login, sehingga halaman login
+# tidak ikut memuat pandas, pricing_core, maupun klien Google/gspread.
+
+# --- Impor Library Standar dan Pihak Ketiga ---
+import streamlit as st
+import pandas as pd
+import os
+import json
+import atexit
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from datetime import datetime
+import pytz
+
+# --- Inti Perhitungan Harga (Bersama dengan service.py) ---
+from pricing_core import (
+    GRADE_FACTORS, format_rupiah, CAR_SCHEMA, MOTOR_SCHEMA, MARKET_AVG_COL,
+    SERPAPI_DEFAULT_CACHE_TTL, SERPAPI_RATE_PER_SECOND,
+    get_http_session, stream_openrouter, LLMStream, TieredCache, make_cache_key,
+    DatasetRegistry, resolve_grade_factors, lookup_row_position,
+    read_lot_file, price_lot, build_query_variants, RateBudget, SerpApiHarvester, SearchJob,
+    context_budget_for_model, summarize_search_evidence, stream_llm_non_auto,
+    METRICS, current_user, start_metrics_exporter,
+)
+
+logger = logging.getLogger(__name__)
+
+
+# ==============================================================================
+# FUNGSI-FUNGSI HELPER
+# ==============================================================================
+
+# --- Log Aktivitas ke Google Sheet (Write-Behind) ---
+LOG_SPILL_PATH = os.path.join(".cache", "activity_log_spill.jsonl")
+
+def build_log_row(log_data: dict):
+    """Menyusun satu baris log sesuai urutan kolom di sheet log_st."""
+    return [
+        log_data.get('timestamp', ''),
+        log_data.get('user', ''),
+        log_data.get('tipe_estimasi', ''),
+        log_data.get('detail_query', ''),
+        log_data.get('grade_dipilih', ''),
+        str(log_data.get('harga_awal', '')),         # Paksa konversi ke string
+        str(log_data.get('harga_disesuaikan', '')),  # Paksa konversi ke string
+        log_data.get('respon_llm', '')
+    ]
+
+class SheetLogWriter:
+    """
+    Penulis log latar belakang. Baris log masuk ke antrean terbatas di memori dan
+    dikirim per batch lewat append_rows saat jumlahnya mencapai batch_size atau
+    setelah flush_interval detik, memakai satu klien gspread yang sama. Jika Sheets
+    API gagal atau terkena rate limit, baris disimpan ke file spill (append-only)
+    dan dikirim ulang pada flush berikutnya setelah masa backoff. Saat proses berhenti,
+    close() memberi sinyal ke pekerja agar batch yang sedang dikumpulkan beserta sisa
+    antrean dikirim (atau di-spill) sebelum thread-nya selesai.
+    """
+    _STOP = object()  # sentinel untuk membangunkan pekerja yang sedang menunggu antrean
+
+    def __init__(self, creds_info, spreadsheet_name="log_st", max_queue=1000,
+                 batch_size=20, flush_interval=5.0, retry_backoff=60.0, spill_path=LOG_SPILL_PATH):
+        self.creds_info = creds_info
+        self.spreadsheet_name = spreadsheet_name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_backoff = retry_backoff
+        self.spill_path = spill_path
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._spill_lock = threading.Lock()
+        self._worksheet = None
+        self._retry_at = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sheet-log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def enqueue(self, row):
+        """Menitipkan satu baris log tanpa menunggu jaringan; antrean penuh (atau penulis sudah ditutup) langsung ke spill."""
+        if self._stop.is_set():
+            self._spill([row])
+            return
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self._spill([row])
+
+    def close(self, timeout=15.0):
+        """
+        Menghentikan pekerja dan menunggunya mengirim batch terakhir (dipanggil saat proses
+        berhenti). Pengiriman dibatasi timeout detik agar shutdown tidak tertahan jaringan.
+        """
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        with suppress(queue.Full):
+            self._queue.put_nowait(self._STOP)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning("Penulis log belum selesai mengirim batch terakhir dalam %.0f detik", timeout)
+            return
+        # Baris yang masuk antrean bersamaan dengan penghentian pekerja langsung ke spill
+        leftovers = []
+        while True:
+            try:
+                row = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if row is not self._STOP:
+                leftovers.append(row)
+        self._spill(leftovers)
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while not self._stop.is_set():
+            try:
+                row = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                if row is not self._STOP:
+                    batch.append(row)
+            except queue.Empty:
+                pass
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                if batch or os.path.exists(self.spill_path):
+                    self._flush(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+
+        # Berhenti: batch lokal dan sisa antrean dikirim sekali, gagal berarti masuk spill
+        while True:
+            try:
+                row = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if row is not self._STOP:
+                batch.append(row)
+        if batch:
+            self._flush(batch)
+
+    def _sheet(self):
+        if self._worksheet is None:
+            scopes = [
+                'https://www.googleapis.com/auth/spreadsheets',
+                'https://www.googleapis.com/auth/drive'
+            ]
+            # Diimpor saat flush pertama saja agar render halaman tidak menunggu modul Google
+            import gspread
+            from google.oauth2.service_account import Credentials
+            creds = Credentials.from_service_account_info(self.creds_info, scopes=scopes)
+            self._worksheet = gspread.authorize(creds).open(self.spreadsheet_name).sheet1
+        return self._worksheet
+
+    def _flush(self, rows):
+        if time.monotonic() < self._retry_at:
+            self._spill(rows)
+            return
+        with self._spill_lock:
+            spilled = self._read_spill()
+            try:
+                with METRICS.track("sheets_append"):
+                    self._sheet().append_rows(spilled + rows)
+            except Exception:
+                logger.exception("Gagal mengirim %d baris log ke Google Sheet, disimpan ke spill", len(spilled) + len(rows))
+                self._worksheet = None
+                self._retry_at = time.monotonic() + self.retry_backoff
+                self._append_spill(rows)
+                return
+            if spilled:
+                os.remove(self.spill_path)
+
+    def _spill(self, rows):
+        with self._spill_lock:
+            self._append_spill(rows)
+
+    def _append_spill(self, rows):
+        if not rows:
+            return
+        os.makedirs(os.path.dirname(self.spill_path), exist_ok=True)
+        with open(self.spill_path, "a", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+    def _read_spill(self):
+        try:
+            with open(self.spill_path, encoding="utf-8") as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+@st.cache_resource
+def get_log_writer():
+    """Satu penulis log untuk seluruh proses."""
+    return SheetLogWriter(st.secrets["gcp_service_account"])
+
+def log_activity_to_sheet(log_data: dict):
+    """Menitipkan log aktivitas ke antrean; pengiriman ke Google Sheet berjalan di latar belakang."""
+    get_log_writer().enqueue(build_log_row(log_data))
+
+# --- Fungsi API OpenRouter ---
+def ask_openrouter_stream(prompt: str):
+    """Respons OpenRouter sebagai LLMStream; kegagalan dibaca dari ok/error setelah aliran habis."""
+    try:
+        api_key = st.secrets["openrouter"]["api_key"]
+        model = st.secrets["openrouter"]["model"]
+    except (KeyError, FileNotFoundError):
+        return LLMStream.failed("Konfigurasi API Key OpenRouter tidak ditemukan di Streamlit Secrets.")
+
+    messages = [
+        {"role": "system", "content": "Anda adalah seorang analis keuangan dan pasar otomotif profesional."},
+        {"role": "user", "content": prompt}
+    ]
+    return LLMStream(stream_openrouter(messages, api_key, model))
+
+@st.cache_resource
+def get_llm_cache():
+    """Cache analisis LLM untuk seluruh proses (dan antar proses lewat SQLite)."""
+    return TieredCache("llm")
+
+def make_llm_cache_key(kind, identity, grade, price):
+    """
+    Kunci cache analisis kendaraan. Prompt-nya deterministik selain tahun berjalan, jadi
+    kuncinya cukup identitas kendaraan, grade, harga yang dibulatkan ke Rp 100.000,
+    nama model LLM, dan tahun berjalan. None jika konfigurasi OpenRouter tidak ada.
+    """
+    try:
+        llm_model = st.secrets["openrouter"]["model"]
+    except (KeyError, FileNotFoundError):
+        return None
+    rounded_price = int(round(float(price) / 100_000)) if pd.notna(price) else None
+    return make_cache_key(kind, [str(part).strip().lower() for part in identity], grade, rounded_price, llm_model, pd.Timestamp.now().year)
+
+# --- Registry Dataset & Faktor Grade (Dibaca dari Secrets) ---
+def grade_factors_for(category):
+    """
+    Vektor faktor grade A-E untuk satu kategori ('mobil', 'mtr', ...). Nilai di
+    secrets [grade_factors.<kategori>] menimpa GRADE_FACTORS per huruf grade.
+    """
+    return resolve_grade_factors(st.secrets.get("grade_factors", {}).get(category, {}))
+
+def current_grade_factors():
+    """Faktor grade semua kategori kendaraan dari secrets saat ini (dibaca ulang setiap rerun)."""
+    return {schema.name: grade_factors_for(schema.name) for schema in (CAR_SCHEMA, MOTOR_SCHEMA)}
+
+@st.cache_resource
+def get_dataset_registry(car_file_id, motor_path, avg_path=None):
+    """Registry dataset tunggal untuk seluruh proses Streamlit, lengkap dengan refresher-nya."""
+    refresh_interval = st.secrets["data_sources"].get("refresh_interval_seconds", 300)
+    # Faktor grade dibaca di thread skrip; thread refresher hanya memakai hasilnya
+    registry = DatasetRegistry(
+        car_file_id, motor_path, avg_path, refresh_interval=refresh_interval, grade_factors=current_grade_factors(),
+        drive_credentials=dict(st.secrets["gcp_service_account"])
+    )
+    registry.start_background_refresh()
+    return registry
+
+# --- Fungsi Umum & UI ---
+@st.cache_resource
+def load_static_asset(path):
+    """
+    Membaca file aset statis (mis. logo) sekali per proses.
+    Byte yang sama dipakai ulang setiap rerun; st.image menyajikannya lewat URL media
+    sehingga browser tidak menerima ulang gambar ber-base64 di setiap klik.
+    """
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def reset_prediction_state():
+    """Mereset session state terkait prediksi saat pengguna mengubah pilihan."""
+    keys_to_reset = [
+        'prediction_made_car', 'selected_data_car', 'selected_row_car', 'modeled_price_car', 'ai_response_car',
+        'prediction_made_motor', 'selected_data_motor', 'selected_row_motor', 'modeled_price_motor', 'ai_response_motor',
+        'non_auto_submitted', 'non_auto_analysis', 'non_auto_job'
+    ]
+    for key in keys_to_reset:
+        st.session_state.pop(key, None)
+
+# --- Sumber Daya Bersama Pencarian Non-Automotif ---
+@st.cache_resource
+def get_serpapi_cache():
+    """Cache hasil SerpAPI untuk seluruh sesi dan proses (memori + SQLite)."""
+    return TieredCache("serpapi", max_entries=1024, default_ttl=SERPAPI_DEFAULT_CACHE_TTL)
+
+@st.cache_resource
+def get_search_executor():
+    """Pool thread bersama (terbatas) untuk panggilan halaman SerpAPI dari seluruh sesi."""
+    return ThreadPoolExecutor(max_workers=8, thread_name_prefix="serpapi")
+
+@st.cache_resource
+def get_job_executor():
+    """Pool thread untuk mengorkestrasi job pencarian (terpisah agar tidak saling menunggu dengan pool halaman)."""
+    return ThreadPoolExecutor(max_workers=16, thread_name_prefix="search-job")
+
+@st.cache_resource
+def get_rate_budget(key_fingerprint):
+    """Satu anggaran laju per API key (dikunci dengan sidik jari key, bukan key mentahnya)."""
+    return RateBudget(SERPAPI_RATE_PER_SECOND, burst=SERPAPI_RATE_PER_SECOND)
+
+
+def _apply_suggestion(widget_values):
+    """Callback: mengisi selectbox bertingkat dari kandidat pencarian cepat."""
+    for key, value in widget_values.items():
+        st.session_state[key] = value
+    reset_prediction_state()
+
+def render_quick_search(fuzzy_index, key_prefix, widget_keys):
+    """Pencarian teks bebas yang toleran typo; kandidat bisa langsung dipilih ke selectbox."""
+    query = st.text_input(
+        "🔎 Cari Cepat (opsional)", key=f"{key_prefix}_quick_search",
+        placeholder="Contoh: avanza 1.3 g 2019"
+    )
+    if not query.strip():
+        return
+    candidates = fuzzy_index.search(query)
+    if not candidates:
+        st.caption("Tidak ada kendaraan yang mirip dengan pencarian tersebut.")
+        return
+    columns = (*fuzzy_index.schema.key_cols, fuzzy_index.schema.year_col)
+    for i, candidate in enumerate(candidates):
+        label = " ".join(str(candidate[col]) for col in columns)
+        widget_values = {key: str(candidate[col]) if col == fuzzy_index.schema.year_col else candidate[col]
+                         for key, col in zip(widget_keys, columns)}
+        st.button(
+            f"{label} (kemiripan {candidate['score']:.0%})", key=f"{key_prefix}_suggestion_{i}",
+            on_click=_apply_suggestion, args=(widget_values,), use_container_width=True
+        )
+
+def stream_vehicle_analysis(prompt, kind, identity, grade, price):
+    """
+    Menampilkan analisis AI kendaraan: dari cache bila ada, jika tidak dialirkan
+    token demi token dari OpenRouter. Mengembalikan teks lengkap untuk log & session state,
+    atau None bila aliran gagal (pesan error sudah ditampilkan; tidak di-cache maupun di-log).
+    """
+    st.markdown("---")
+    st.subheader("🤖 AI Analisis LEGOAS")
+    cache_key = make_llm_cache_key(kind, identity, grade, price)
+    response = get_llm_cache().get(cache_key) if cache_key is not None else None
+    if response is not None:
+        st.markdown(response)
+        return response
+
+    stream = ask_openrouter_stream(prompt)
+    st.write_stream(stream)
+    if not stream.ok:
+        st.error(f"⚠️ {stream.error}")
+        return None
+    if cache_key is not None and stream.text:
+        get_llm_cache().set(cache_key, stream.text)
+    return stream.text
+
+def render_price_estimate(estimate, grade=None):
+    """Menampilkan estimasi statistik non-otomotif (median, pita kepercayaan, harga per grade)."""
+    st.markdown("#### 📊 Estimasi Statistik dari Data Pencarian")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Median Harga (Grade A)", format_rupiah(estimate.median))
+    col2.metric("Rentang Kepercayaan 95%", f"{format_rupiah(estimate.low)} – {format_rupiah(estimate.high)}")
+    col3.metric("Jumlah Harga Dipakai", f"{estimate.sample_size} (buang {estimate.outliers_removed} pencilan)")
+    if grade is not None:
+        st.success(f"💰 Estimasi Harga Grade {grade}: **{format_rupiah(estimate.grade_prices[grade])}**")
+    if not estimate.strong:
+        st.caption("Bukti harga masih lemah (sedikit atau sangat bervariasi); perlakukan angka ini sebagai indikasi awal.")
+
+def label_metrics_user():
+    """
+    Memberi label pengguna sesi ini pada metrik yang tercatat selama run (termasuk di thread
+    pekerja). Dipanggil di awal main_page dan setiap fragment: rerun fragment bisa berjalan di
+    thread ScriptRunner baru yang contextvar-nya masih bernilai bawaan "-".
+    """
+    current_user.set(st.session_state.get('username', '-'))
+
+@st.fragment
+def render_batch_panel(df_ref, schema, key_prefix, example_columns, fuzzy_index=None, price_matrix=None, depreciation=None):
+    """Menampilkan panel unggah lot dan unduh hasil estimasi batch."""
+    label_metrics_user()
+    with st.expander("📦 Estimasi Batch (Unggah Daftar Lot)"):
+        st.caption(f"Format kolom: {example_columns}. Grade diisi A-E (kosong dianggap A).")
+        uploaded_file = st.file_uploader("Unggah file lot (CSV/XLSX)", type=["csv", "xlsx"], key=f"{key_prefix}_lot_file")
+        if uploaded_file is None:
+            return
+        try:
+            priced = price_lot(read_lot_file(uploaded_file), df_ref, schema, fuzzy_index, price_matrix, depreciation)
+        except ValueError as e:
+            st.error(f"❌ {e}")
+            return
+
+        matched = int((priced["status"] == "cocok").sum())
+        modeled = int((priced["status"] == "dimodelkan").sum())
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Total Baris", len(priced))
+        col2.metric("Cocok", matched)
+        col3.metric("Dimodelkan", modeled)
+        col4.metric("Tidak Cocok", len(priced) - matched - modeled)
+        st.dataframe(priced.head(100), use_container_width=True)
+        st.download_button(
+            "⬇️ Unduh Hasil Estimasi (CSV)",
+            data=priced.to_csv(index=False).encode('utf-8-sig'),
+            file_name=f"estimasi_lot_{key_prefix}.csv",
+            mime="text/csv",
+            use_container_width=True,
+            key=f"{key_prefix}_lot_download",
+        )
+
+def is_admin():
+    """True jika pengguna yang login tercantum di secrets [admin] users."""
+    return st.session_state.get('username') in st.secrets.get("admin", {}).get("users", [])
+
+def render_metrics_page(registry):
+    """Halaman admin: latensi p50/p95/p99 per tahap dan per pengguna, token & biaya LLM, serta cache."""
+    st.markdown('<h2 class="section-header">Metrik Sistem</h2>', unsafe_allow_html=True)
+    st.caption(
+        "Metrik dalam memori proses Streamlit ini sejak start; persentil dihitung dari "
+        "jendela bergulir sampel terakhir per tahap dan pengguna."
+    )
+    if registry.last_error is not None:
+        st.warning(f"Error terakhir pemuatan data: {registry.last_error}")
+
+    latency_format = {"rasio_error": "{:.1%}", "p50_ms": "{:.1f}", "p95_ms": "{:.1f}", "p99_ms": "{:.1f}", "biaya_usd": "{:.4f}"}
+    stage_rows = METRICS.summary()
+    if not stage_rows:
+        st.info("Belum ada metrik yang tercatat.")
+    else:
+        st.subheader("Per Tahap")
+        st.dataframe(pd.DataFrame(stage_rows).style.format(latency_format), use_container_width=True, hide_index=True)
+        st.subheader("Per Pengguna")
+        st.dataframe(pd.DataFrame(METRICS.summary(by_user=True)).style.format(latency_format), use_container_width=True, hide_index=True)
+
+    cache_rows = METRICS.cache_summary()
+    if cache_rows:
+        st.subheader("Cache")
+        st.dataframe(pd.DataFrame(cache_rows).style.format({"hit_rate": "{:.1%}"}), use_container_width=True, hide_index=True)
+
+    st.download_button(
+        "⬇️ Unduh Metrik (Format Prometheus)",
+        data=METRICS.render_prometheus().encode("utf-8"),
+        file_name="legoas_metrics.prom",
+        mime="text/plain",
+        use_container_width=True,
+    )
+
+@st.cache_resource
+def get_metrics_exporter(path, interval):
+    """Satu thread ekspor metrik ke file per proses (untuk textfile collector Prometheus)."""
+    return start_metrics_exporter(path, interval)
+
+# --- Panel Estimasi (Fragment) ---
+# Setiap panel adalah st.fragment: interaksi di dalamnya hanya menjalankan ulang panel
+# tersebut, bukan seluruh main_page (sidebar, logo, pemeriksaan dataset, menu lain).
+# Bagian harga per grade adalah fragment tersendiri di dalam panel kendaraan, sehingga
+# mengganti grade hanya menghitung ulang baris harganya.
+# Fragment memakai snapshot dari rerun penuh terakhir; versi dataset baru terpasang
+# pada rerun penuh berikutnya.
+
+MODELED_PRICE_NOTE = "📈 Tahun ini tidak ada di dataset; harga **dimodelkan** dari kurva depresiasi varian yang sama."
+
+@st.fragment
+def render_car_panel(snapshot, registry):
+    """Panel estimasi mobil: pencarian cepat, selectbox bertingkat, dan tombol estimasi."""
+    label_metrics_user()
+    st.markdown('<h2 class="section-header">Estimasi Harga Mobil Bekas</h2>', unsafe_allow_html=True)
+
+    df_mobil = snapshot.df_mobil
+    if df_mobil.empty:
+        if registry.last_error is not None:
+            st.error(f"Gagal memuat atau memproses data dari Google Drive: {registry.last_error}")
+        st.error("Data mobil tidak dapat dimuat. Aplikasi tidak dapat dilanjutkan.")
+        return
+
+    render_quick_search(snapshot.car_fuzzy, "car", ("car_brand", "car_model", "car_varian", "car_year"))
+    col1, col2 = st.columns(2)
+    with col1:
+        brand = st.selectbox("Brand", snapshot.select_options("mobil"), key="car_brand", on_change=reset_prediction_state)
+    with col2:
+        model = st.selectbox("Model", snapshot.select_options("mobil", brand), key="car_model", on_change=reset_prediction_state)
+
+    col3, col4 = st.columns(2)
+    with col3:
+        varian = st.selectbox("Varian", snapshot.select_options("mobil", brand, model), key="car_varian", on_change=reset_prediction_state)
+    with col4:
+        year = st.selectbox("Tahun", snapshot.select_options("mobil", brand, model, varian), key="car_year", on_change=reset_prediction_state)
+
+    if st.button("🔍 Lihat Estimasi Harga", use_container_width=True, key="car_estimate_button"):
+        if "-" in [brand, model, varian, year]:
+            st.warning("⚠️ Mohon lengkapi semua pilihan terlebih dahulu.")
+        else:
+            row_position = lookup_row_position(snapshot.car_index, brand, model, varian, int(year))
+            modeled = snapshot.car_depreciation.price((brand, model, varian), int(year)) if row_position is None else None
+            if row_position is not None:
+                st.session_state.prediction_made_car = True
+                st.session_state.selected_data_car = df_mobil.iloc[row_position]
+                st.session_state.selected_row_car = row_position
+            elif modeled is not None:
+                # Varian ada tetapi tahunnya tidak: harga dari kurva depresiasi varian tersebut
+                st.session_state.prediction_made_car = True
+                st.session_state.selected_data_car = pd.Series({"name": brand, "model": model, "varian": varian, "tahun": int(year)})
+                st.session_state.selected_row_car = None
+                st.session_state.modeled_price_car = modeled[0]
+            else:
+                st.error("❌ Kombinasi tersebut tidak ditemukan di dataset.")
+                suggestions = snapshot.car_fuzzy.search(f"{brand} {model} {varian}", year=int(year), limit=3)
+                if suggestions:
+                    st.caption("Mungkin maksud Anda: " + "; ".join(
+                        f"{c['name']} {c['model']} {c['varian']} ({c['tahun']})" for c in suggestions))
+                reset_prediction_state()
+
+    if st.session_state.get('prediction_made_car'):
+        render_car_quote(snapshot.car_prices)
+
+@st.fragment
+def render_car_quote(car_prices):
+    """Harga awal, pilihan grade, harga akhir, dan analisis AI untuk mobil yang dipilih."""
+    label_metrics_user()
+    if not st.session_state.get('prediction_made_car'):
+        return
+    selected_data = st.session_state.selected_data_car
+    selected_row = st.session_state.selected_row_car
+    modeled = selected_row is None
+    initial_price = st.session_state.modeled_price_car if modeled else car_prices.base[selected_row]
+    st.markdown("---")
+    st.info(f"📊 Estimasi Harga Pasar Awal: **{format_rupiah(initial_price)}**")
+    if modeled:
+        st.caption(MODELED_PRICE_NOTE)
+    market_average = selected_data.get(MARKET_AVG_COL)
+    if pd.notna(market_average) and initial_price:
+        gap = (market_average - initial_price) / initial_price
+        st.caption(f"🏷️ Rata-rata harga pasar: **{format_rupiah(market_average)}** ({gap:+.1%} terhadap estimasi)")
+
+    grade_selection = st.selectbox("Pilih Grade Kondisi Kendaraan", options=list(GRADE_FACTORS.keys()), key="car_grade")
+    adjusted_price = initial_price * car_prices.factor(grade_selection) if modeled else car_prices.price(selected_row, grade_selection)
+    st.success(f"💰 Estimasi Harga Akhir (Grade {grade_selection.split(' ')[0]}): **{format_rupiah(adjusted_price)}**")
+
+    ai_streamed = False
+    if st.button("🤖 Generate Analisis Profesional", use_container_width=True, key="car_ai_button"):
+        prompt = f"""Sebagai analis pasar otomotif di LEGOAS, berikan analisis harga untuk mobil bekas:
+- Detail: {selected_data['name']} {selected_data['model']} {selected_data['varian']} tahun {int(selected_data['tahun'])}
+- Grade Kondisi: {grade_selection}
+- Estimasi Harga Akhir: {format_rupiah(adjusted_price)}
+
+Tugas Anda: Jelaskan secara profesional mengapa harga tersebut wajar, hubungkan dengan grade, sentimen pasar, popularitas model, dan kondisi ekonomi di tahun {pd.Timestamp.now().year}. Gunakan format poin-poin."""
+        response = stream_vehicle_analysis(
+            prompt, "mobil",
+            (selected_data['name'], selected_data['model'], selected_data['varian'], int(selected_data['tahun'])),
+            grade_selection, adjusted_price
+        )
+        ai_streamed = True
+        st.session_state.ai_response_car = response
+        
+        if response:
+            # Siapkan timestamp dan user sekarang
+            jakarta_tz = pytz.timezone('Asia/Jakarta')
+            timestamp = datetime.now(jakarta_tz).isoformat()
+            user = st.session_state.get('username', 'unknown')
+
+            # Gabungkan detail pencarian menjadi satu string
+            detail_query = f"Mobil: {selected_data['name']} {selected_data['model']} {selected_data['varian']} ({int(selected_data['tahun'])})"
+            if modeled:
+                detail_query += " [dimodelkan]"
+
+            log_payload = {
+                "timestamp": timestamp, "user": user, "tipe_estimasi": "Mobil",
+                "detail_query": detail_query, "grade_dipilih": grade_selection,
+                "harga_awal": initial_price, "harga_disesuaikan": adjusted_price,
+                "respon_llm": response
+            }
+            log_activity_to_sheet(log_payload) # Panggil fungsi yang baru
+
+    # Respons yang baru saja dialirkan sudah tampil, jangan digambar dua kali
+    if st.session_state.get('ai_response_car') and not ai_streamed:
+        st.markdown("---")
+        st.subheader("🤖 AI Analisis LEGOAS")
+        st.markdown(st.session_state.ai_response_car)
+
+@st.fragment
+def render_motor_panel(snapshot):
+    """Panel estimasi motor: pencarian cepat, selectbox bertingkat, dan tombol estimasi."""
+    label_metrics_user()
+    st.markdown('<h2 class="section-header">Estimasi Harga Motor Bekas</h2>', unsafe_allow_html=True)
+
+    df_motor = snapshot.df_motor
+    if df_motor.empty:
+        st.warning("Data motor tidak dapat dimuat. Fitur ini tidak tersedia.")
+        return
+
+    render_quick_search(snapshot.motor_fuzzy, "motor", ("motor_brand", "motor_variant", "motor_year"))
+    col1, col2 = st.columns(2)
+    with col1:
+        brand = st.selectbox("Brand", snapshot.select_options("motor"), key="motor_brand", on_change=reset_prediction_state)
+    with col2:
+        variant = st.selectbox("Varian", snapshot.select_options("motor", brand), key="motor_variant", on_change=reset_prediction_state)
+
+    year = st.selectbox("Tahun", snapshot.select_options("motor", brand, variant), key="motor_year", on_change=reset_prediction_state)
+
+    if st.button("🔍 Lihat Estimasi Harga", use_container_width=True, key="motor_estimate_button"):
+        if "-" in [brand, variant, year]:
+            st.warning("⚠️ Mohon lengkapi semua pilihan terlebih dahulu.")
+        else:
+            row_position = lookup_row_position(snapshot.motor_index, brand, variant, int(year))
+            modeled = snapshot.motor_depreciation.price((brand, variant), int(year)) if row_position is None else None
+            if row_position is not None:
+                st.session_state.prediction_made_motor = True
+                st.session_state.selected_data_motor = df_motor.iloc[row_position]
+                st.session_state.selected_row_motor = row_position
+            elif modeled is not None:
+                # Varian ada tetapi tahunnya tidak: harga dari kurva depresiasi varian tersebut
+                st.session_state.prediction_made_motor = True
+                st.session_state.selected_data_motor = pd.Series({"brand": brand, "variant": variant, "year": int(year)})
+                st.session_state.selected_row_motor = None
+                st.session_state.modeled_price_motor = modeled[0]
+            else:
+                st.error("❌ Kombinasi tersebut tidak ditemukan di dataset.")
+                suggestions = snapshot.motor_fuzzy.search(f"{brand} {variant}", year=int(year), limit=3)
+                if suggestions:
+                    st.caption("Mungkin maksud Anda: " + "; ".join(
+                        f"{c['brand']} {c['variant']} ({c['year']})" for c in suggestions))
+                reset_prediction_state()
+
+    if st.session_state.get('prediction_made_motor'):
+        render_motor_quote(snapshot.motor_prices)
+
+@st.fragment
+def render_motor_quote(motor_prices):
+    """Harga awal, pilihan grade, harga akhir, dan analisis AI untuk motor yang dipilih."""
+    label_metrics_user()
+    if not st.session_state.get('prediction_made_motor'):
+        return
+    selected_data = st.session_state.selected_data_motor
+    selected_row = st.session_state.selected_row_motor
+    modeled = selected_row is None
+    initial_price = st.session_state.modeled_price_motor if modeled else motor_prices.base[selected_row]
+    st.markdown("---")
+    st.info(f"📊 Estimasi Harga Pasar Awal: **{format_rupiah(initial_price)}**")
+    if modeled:
+        st.caption(MODELED_PRICE_NOTE)
+
+    grade_selection = st.selectbox("Pilih Grade Kondisi Kendaraan", options=list(GRADE_FACTORS.keys()), key="motor_grade")
+    adjusted_price = initial_price * motor_prices.factor(grade_selection) if modeled else motor_prices.price(selected_row, grade_selection)
+    st.success(f"💰 Estimasi Harga Akhir (Grade {grade_selection.split(' ')[0]}): **{format_rupiah(adjusted_price)}**")
+
+    ai_streamed = False
+    if st.button("🤖 Generate Analisis Profesional", use_container_width=True, key="motor_ai_button"):
+        prompt = f"""Sebagai analis pasar otomotif di LEGOAS, berikan analisis harga untuk motor bekas:
+- Detail: {selected_data['brand']} {selected_data['variant']} tahun {int(selected_data['year'])}
+- Grade Kondisi: {grade_selection}
+- Estimasi Harga Akhir: {format_rupiah(adjusted_price)}
+
+Tugas Anda: Jelaskan secara profesional mengapa harga tersebut wajar, hubungkan dengan grade, sentimen pasar, popularitas model, dan kondisi ekonomi di tahun {pd.Timestamp.now().year}. Gunakan format poin-poin."""
+        response = stream_vehicle_analysis(
+            prompt, "motor",
+            (selected_data['brand'], selected_data['variant'], int(selected_data['year'])),
+            grade_selection, adjusted_price
+        )
+        ai_streamed = True
+        st.session_state.ai_response_motor = response
+
+        if response:
+            # Siapkan timestamp dan user
+            jakarta_tz = pytz.timezone('Asia/Jakarta')
+            timestamp = datetime.now(jakarta_tz).isoformat()
+            user = st.session_state.get('username', 'unknown')
+            
+            # Gabungkan detail pencarian menjadi satu string
+            detail_query = f"Motor: {selected_data['brand']} {selected_data['variant']} ({int(selected_data['year'])})"
+            if modeled:
+                detail_query += " [dimodelkan]"
+
+            log_payload = {
+                "timestamp": timestamp, "user": user, "tipe_estimasi": "Motor",
+                "detail_query": detail_query, "grade_dipilih": grade_selection,
+                "harga_awal": initial_price, "harga_disesuaikan": adjusted_price,
+                "respon_llm": response
+            }
+            log_activity_to_sheet(log_payload) # <-- Panggil fungsi yang benar
+
+    # Respons yang baru saja dialirkan sudah tampil, jangan digambar dua kali
+    if st.session_state.get('ai_response_motor') and not ai_streamed:
+        st.markdown("---")
+        st.subheader("🤖 AI Analisis LEGOAS")
+        st.markdown(st.session_state.ai_response_motor)
+
+@st.fragment
+def render_non_auto_panel(category, time_filter_value, use_condition_filter, use_url_filter):
+    """Panel estimasi non-otomotif: formulir pencarian dan pemantauan job SerpAPI + analisis AI."""
+    label_metrics_user()
+    st.markdown('<h2 class="section-header">Estimasi Harga Barang Non-Automotif</h2>', unsafe_allow_html=True)
+    
+    with st.form("non_auto_form"):
+        product_name_display = ""
+        grade_input = "A" 
+
+        if category == "Umum":
+            keywords = st.text_input("Masukkan Nama Barang", "iPhone 14 Pro 256GB", help="Coba sespesifik mungkin untuk hasil terbaik.")
+            product_name_display = keywords
+        elif category == "Spare Part":
+            keywords = st.text_input("Masukkan Nama Spare Part", "Busi Honda Vario 125", help="Contoh: 'Kampas rem Avanza'")
+            product_name_display = keywords
+        elif category == "Alat Berat":
+            alat_type = st.text_input("Jenis Alat", "Excavator")
+            brand = st.text_input("Merek", "Komatsu")
+            model = st.text_input("Model / Kapasitas", "PC200-8")
+            year = st.text_input("Tahun (Wajib)", "2015")
+            product_name_display = f"{alat_type} {brand} {model} {year}"
+        elif category == "Scrap":
+            scrap_type = st.selectbox("Pilih Jenis Limbah", ["Besi Tua", "Tembaga", "Aluminium", "Aki Bekas", "Oli Bekas", "Kardus Bekas"])
+            unit = st.selectbox("Pilih Satuan Harga", ["per kg", "per liter", "per drum", "per unit"])
+            product_name_display = f"{scrap_type} ({unit})"
+
+        if category != "Scrap":
+            grade_input = st.selectbox("Pilih Grade Kondisi Barang", ["A", "B", "C", "D", "E"], help="A (Sangat Baik), E (Buruk).")
+
+        skip_llm_when_strong = st.checkbox(
+            "Lewati analisis AI jika data harga sudah kuat", value=True,
+            help="Estimasi statistik langsung dipakai bila cukup banyak harga yang konsisten ditemukan."
+        )
+        submitted = st.form_submit_button("Analisis Harga Sekarang!", use_container_width=True)
+
+    if submitted:
+        SERPAPI_API_KEY = st.secrets["openrouter"]["serpapi"]
+        inputs = {}
+        if category in ("Umum", "Spare Part"): inputs = {"keywords": keywords}
+        elif category == "Alat Berat": inputs = {"alat_type": alat_type, "brand": brand, "model": model, "year": year}
+        elif category == "Scrap": inputs = {"scrap_type": scrap_type, "unit": unit}
+        param_variants = build_query_variants(category, time_filter_value, use_condition_filter, use_url_filter, **inputs)
+
+        # Pencarian langsung berjalan di pool thread; skrip hanya memantau kemajuannya.
+        # Session & anggaran laju diambil di thread skrip, pekerja tidak menyentuh API Streamlit.
+        harvester = SerpApiHarvester(
+            get_search_executor(), get_http_session("serpapi"), SERPAPI_API_KEY,
+            get_rate_budget(make_cache_key("serpapi", SERPAPI_API_KEY)), cache=get_serpapi_cache()
+        )
+        st.session_state.non_auto_job = SearchJob(
+            get_job_executor(), harvester, param_variants,
+            category=category, product_name=product_name_display, grade=grade_input,
+            skip_llm_when_strong=skip_llm_when_strong
+        )
+
+    job = st.session_state.get('non_auto_job')
+    if job is not None:
+        OPENROUTER_API_KEY = st.secrets["openrouter"]["api_key"]
+        category = job.context["category"]
+        product_name_display = job.context["product_name"]
+        grade_input = job.context["grade"]
+
+        with st.spinner(f"Menganalisis harga untuk '{product_name_display}'..."):
+            st.info("Langkah 1/3: Mengambil data dari internet (beberapa halaman & varian paralel)...")
+            progress = st.progress(0.0)
+            while not job.done:
+                progress.progress(job.progress)
+                time.sleep(0.2)
+            progress.progress(1.0)
+            serpapi_data, search_errors = job.result()
+            # Job selesai dipakai; rerun berikutnya tidak mengulang analisis
+            st.session_state.pop('non_auto_job', None)
+            for error in search_errors:
+                st.warning(f"Sebagian pencarian gagal: {error}")
+
+            if serpapi_data:
+                st.info("Langkah 2/3: Memfilter & membersihkan data...")
+                llm_model = st.secrets["openrouter"]["model"]
+                token_budget = st.secrets["openrouter"].get("context_token_budget") or context_budget_for_model(llm_model)
+                listing_records, context_text, context_stats, estimate = summarize_search_evidence(
+                    serpapi_data, product_name_display, token_budget
+                )
+                st.caption(
+                    f"Konteks AI: {context_stats['selected']}/{context_stats['records']} cuplikan, "
+                    f"~{context_stats['tokens']}/{token_budget} token "
+                    f"({context_stats['duplicates']} duplikat, {context_stats['over_budget']} melebihi anggaran)."
+                )
+                if estimate is not None:
+                    render_price_estimate(estimate, grade_input if category != "Scrap" else None)
+
+                if context_text:
+                    ai_error = None
+                    if estimate is not None and estimate.strong and job.context["skip_llm_when_strong"]:
+                        # Bukti harga kuat: estimasi statistik dipakai langsung tanpa memanggil LLM
+                        ai_analysis = None
+                        st.success("Analisis Selesai! (estimasi statistik, tanpa AI)")
+                    else:
+                        st.info("Langkah 3/3: Mengirim data ke AI untuk dianalisis...")
+                        # Hasil analisis langsung tampil per token sambil dirakit menjadi teks utuh
+                        st.subheader(f"📝 Analisis AI LEGOAS untuk {product_name_display}")
+                        ai_stream = stream_llm_non_auto(context_text, product_name_display, OPENROUTER_API_KEY, grade_input, llm_model)
+                        st.write_stream(ai_stream)
+                        ai_analysis = ai_stream.text
+                        if not ai_stream.ok:
+                            ai_error = ai_stream.error
+                        elif not ai_analysis:
+                            ai_error = "Tidak menerima respons dari AI."
+                    
+                    if ai_error is None:
+                        if ai_analysis:
+                            st.success("Analisis Selesai!")
+                            st.session_state.non_auto_analysis = ai_analysis
+                        
+                        # Siapkan timestamp dan user
+                        jakarta_tz = pytz.timezone('Asia/Jakarta')
+                        timestamp = datetime.now(jakarta_tz).isoformat()
+                        user = st.session_state.get('username', 'unknown')
+                        
+                        # Siapkan detail query
+                        detail_query = f"{category}: {product_name_display}"
+                        grade_price = estimate.grade_prices.get(grade_input) if estimate and category != 'Scrap' else None
+
+                        log_payload = {
+                            "timestamp": timestamp,
+                            "user": user,
+                            "tipe_estimasi": "Non-Automotif",
+                            "detail_query": detail_query,
+                            "grade_dipilih": grade_input if category != 'Scrap' else 'N/A',
+                            "harga_awal": round(estimate.median) if estimate else 'N/A',  # Median statistik, jika ada harga
+                            "harga_disesuaikan": round(grade_price) if grade_price else 'N/A',
+                            "respon_llm": ai_analysis or "Estimasi statistik (tanpa AI)"
+                        }
+                        log_activity_to_sheet(log_payload) # Panggil fungsi yang benar
+                    else: st.error(f"Analisis Gagal: {ai_error}")
+                else: st.error("Ekstraksi Teks Gagal: Tidak ada hasil pencarian yang relevan.")
+            else: st.error("Pengambilan Data Gagal: Tidak menerima data dari SerpAPI.")
+
+def main_page():
+    """Menampilkan halaman utama aplikasi setelah login berhasil."""
+    label_metrics_user()
+    metrics_config = st.secrets.get("metrics", {})
+    if metrics_config.get("export_path"):
+        get_metrics_exporter(metrics_config["export_path"], metrics_config.get("export_interval_seconds", 15))
+
+    # --- Muat Data ---
+    # Membaca ID file mobil dari secrets
+    GOOGLE_DRIVE_FILE_ID = st.secrets["data_sources"]["mobil_data_id"]
+    
+    # Data diambil dari registry bersama; sesi hanya menyimpan nomor versinya.
+    # Hanya pemuatan pertama setelah proses start yang menunggu unduhan Drive.
+    registry = get_dataset_registry(GOOGLE_DRIVE_FILE_ID, "dt/mtr.csv", "dt/avg.csv")
+    # Streamlit memuat ulang secrets.toml saat berubah; faktor grade baru langsung dipakai tanpa restart
+    registry.set_grade_factors(current_grade_factors())
+    snapshot = registry.snapshot
+    if snapshot is None:
+        with st.spinner("Menghubungi Google Drive untuk mengambil data mobil..."):
+            snapshot = registry.ensure_loaded()
+    if st.session_state.get('dataset_version') != snapshot.version:
+        # Hasil prediksi lama tidak valid lagi jika dataset sudah berganti versi
+        reset_prediction_state()
+        st.session_state.dataset_version = snapshot.version
+
+    # --- Sidebar ---
+    with st.sidebar:
+        logo = load_static_asset("dt/logo.png")
+        if logo:
+            st.image(logo, width=140)
+        st.markdown("---")
+        
+        # Menu Pilihan Estimasi
+        menu_options = ["Estimasi Mobil", "Estimasi Motor", "Estimasi Non-Automotif"]
+        if is_admin():
+            menu_options.append("Metrik Sistem (Admin)")
+        tipe_estimasi = st.radio(
+            "Pilih Menu Estimasi", 
+            menu_options, 
+            on_change=reset_prediction_state
+        )
+        
+        # Pengaturan Pencarian dinamis hanya untuk Non-Automotif
+        if tipe_estimasi == "Estimasi Non-Automotif":
+            st.markdown("---")
+            st.subheader("Pengaturan Pencarian")
+            category = st.selectbox("1. Pilih Kategori Barang", ["Umum", "Spare Part", "Alat Berat", "Scrap"])
+            time_filter_options = {"Semua Waktu": "Semua Waktu", "Setahun Terakhir": "qdr:y", "Sebulan Terakhir": "qdr:m", "Seminggu Terakhir": "qdr:w"}
+            selected_time_filter = st.selectbox("2. Filter Waktu", options=list(time_filter_options.keys()))
+            time_filter_value = time_filter_options[selected_time_filter]
+
+            st.subheader("Filter Lanjutan")
+            use_condition_filter = st.checkbox("Fokus Barang Bekas", value=True, help="Fokus mencari barang bekas dan mengabaikan iklan barang baru.")
+            use_url_filter = st.checkbox("Fokus Situs Jual-Beli", value=True, help="Pencarian diprioritaskan pada situs jual-beli utama.")
+        
+        # Tombol Keluar di bagian bawah
+        st.markdown("<br><br>", unsafe_allow_html=True)
+        if st.button("🔒 Keluar", use_container_width=True):
+            for key in list(st.session_state.keys()):
+                del st.session_state[key]
+            st.rerun()
+
+    # --- Halaman Utama ---
+    st.markdown('<h1 class="main-header">Sistem Estimasi Harga LEGOAS</h1>', unsafe_allow_html=True)
+
+    # ========================
+    # --- ESTIMASI MOBIL ---
+    # ========================
+    if tipe_estimasi == "Estimasi Mobil":
+        render_car_panel(snapshot, registry)
+        render_batch_panel(snapshot.df_mobil, CAR_SCHEMA, "car", "brand, model, varian, tahun, grade", snapshot.car_fuzzy, snapshot.car_prices, snapshot.car_depreciation)
+
+    # ========================
+    # --- ESTIMASI MOTOR ---
+    # ========================
+    elif tipe_estimasi == "Estimasi Motor":
+        render_motor_panel(snapshot)
+        if not snapshot.df_motor.empty:
+            render_batch_panel(snapshot.df_motor, MOTOR_SCHEMA, "motor", "brand, varian, tahun, grade", snapshot.motor_fuzzy, snapshot.motor_prices, snapshot.motor_depreciation)
+
+    # =============================
+    # --- ESTIMASI NON-AUTOMOTIF ---
+    # =============================
+    elif tipe_estimasi == "Metrik Sistem (Admin)":
+        render_metrics_page(registry)
+
+    elif tipe_estimasi == "Estimasi Non-Automotif":
+        render_non_auto_panel(category, time_filter_value, use_condition_filter, use_url_filter)
@@ -0,0 +1,2061 @@
+# ==============================================================================
+# INTI PERHITUNGAN HARGA LEGOAS (TANPA STREAMLIT)
+# Dipakai bersama oleh app.py (UI Streamlit) dan service.py (API HTTP/JSON).
+# ==============================================================================
+
+import pandas as pd
+import hashlib
+import os
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import io
+import re
+import json
+import math
+import contextvars
+import functools
+import logging
+import sqlite3
+import threading
+import time
+import numpy as np
+from collections import OrderedDict, defaultdict, deque
+from contextlib import contextmanager, suppress
+from dataclasses import asdict, dataclass, field, replace
+from types import MappingProxyType
+
+# Modul Google API dan pyarrow diimpor di dalam fungsi yang memakainya: keduanya berat
+# dan hanya dibutuhkan saat snapshot dibaca atau data diunduh dari Drive.
+
+logger = logging.getLogger(__name__)
+
+# --- Kamus untuk Faktor Grade ---
+GRADE_FACTORS = {
+    'A (Sangat Baik)': 1.0,
+    'B (Baik)': 0.94,
+    'C (Cukup)': 0.80,
+    'D (Kurang)': 0.58,
+    'E (Buruk)': 0.23,
+}
+GRADE_LETTERS = tuple(label.split(' ')[0] for label in GRADE_FACTORS)
+GRADE_LETTER_FACTORS = dict(zip(GRADE_LETTERS, GRADE_FACTORS.values()))
+
+# --- Format Mata Uang ---
+def format_rupiah(val):
+    """Memformat angka menjadi string mata uang Rupiah."""
+    try:
+        return f"Rp {round(float(val)):,}".replace(",", ".")
+    except (ValueError, TypeError):
+        return "Rp 0"
+
+# --- Instrumentasi Latensi & Biaya per Tahap ---
+# Batas bucket histogram (detik) untuk ekspor Prometheus
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+METRICS_WINDOW = 2048
+
+# Pengguna yang sedang dilayani; diisi UI/API per permintaan dan ikut ke thread pekerja
+current_user = contextvars.ContextVar("current_user", default="-")
+
+def submit_with_context(executor, fn, *args):
+    """executor.submit yang membawa contextvars (misal current_user) ke thread pekerja."""
+    return executor.submit(contextvars.copy_context().run, fn, *args)
+
+class StageMetrics:
+    """
+    Metrik tingkat proses per tahap (Drive, SerpAPI, OpenRouter, Sheets, dst.):
+    jendela bergulir latensi per (tahap, pengguna) untuk p50/p95/p99, histogram
+    kumulatif per tahap untuk Prometheus, serta penghitung error, token, biaya LLM,
+    dan hit/miss cache. Semua operasi dilindungi satu lock dan berbiaya O(1).
+    """
+    def __init__(self, window=METRICS_WINDOW, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+        self._calls = defaultdict(int)
+        self._errors = defaultdict(int)
+        self._bucket_counts = defaultdict(lambda: [0] * (len(buckets) + 1))
+        self._duration_sum = defaultdict(float)
+        self._tokens = defaultdict(int)
+        self._cost = defaultdict(float)
+        self._cache = defaultdict(int)
+
+    def observe(self, stage, seconds, error=False, user=None):
+        user = user or current_user.get()
+        index = next((i for i, bound in enumerate(self.buckets) if seconds <= bound), len(self.buckets))
+        with self._lock:
+            self._samples[(stage, user)].append(seconds)
+            self._calls[(stage, user)] += 1
+            if error:
+                self._errors[(stage, user)] += 1
+            self._bucket_counts[stage][index] += 1
+            self._duration_sum[stage] += seconds
+
+    @contextmanager
+    def track(self, stage, user=None):
+        """Mengukur durasi blok sebagai satu panggilan tahap; Exception dihitung sebagai error."""
+        start = time.perf_counter()
+        error = False
+        try:
+            yield
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.observe(stage, time.perf_counter() - start, error, user)
+
+    def timed(self, stage):
+        """Dekorator: setiap panggilan fungsi dicatat sebagai satu panggilan tahap."""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.track(stage):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def record_tokens(self, stage, prompt_tokens=0, completion_tokens=0, cost=0.0, user=None):
+        user = user or current_user.get()
+        with self._lock:
+            self._tokens[(stage, user, "prompt")] += int(prompt_tokens or 0)
+            self._tokens[(stage, user, "completion")] += int(completion_tokens or 0)
+            self._cost[(stage, user)] += float(cost or 0.0)
+
+    def record_cache(self, cache_name, hit):
+        with self._lock:
+            self._cache[(cache_name, "hit" if hit else "miss")] += 1
+
+    def summary(self, by_user=False):
+        """Ringkasan per tahap (atau per tahap & pengguna): jumlah, rasio error, p50/p95/p99 dalam ms."""
+        with self._lock:
+            samples = {key: list(values) for key, values in self._samples.items()}
+            calls, errors = dict(self._calls), dict(self._errors)
+            tokens, cost = dict(self._tokens), dict(self._cost)
+        groups = defaultdict(list)
+        counts = defaultdict(lambda: [0, 0, 0, 0, 0.0])
+        for (stage, user), values in samples.items():
+            group = (stage, user) if by_user else (stage,)
+            groups[group].extend(values)
+            counts[group][0] += calls.get((stage, user), 0)
+            counts[group][1] += errors.get((stage, user), 0)
+            counts[group][2] += tokens.get((stage, user, "prompt"), 0)
+            counts[group][3] += tokens.get((stage, user, "completion"), 0)
+            counts[group][4] += cost.get((stage, user), 0.0)
+        rows = []
+        for group, values in sorted(groups.items()):
+            p50, p95, p99 = np.percentile(np.asarray(values) * 1000, [50, 95, 99])
+            n_calls, n_errors, prompt_tokens, completion_tokens, total_cost = counts[group]
+            rows.append({
+                "tahap": group[0], **({"pengguna": group[1]} if by_user else {}),
+                "panggilan": n_calls, "rasio_error": n_errors / n_calls if n_calls else 0.0,
+                "p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99),
+                "token_prompt": prompt_tokens, "token_completion": completion_tokens, "biaya_usd": total_cost,
+            })
+        return rows
+
+    def cache_summary(self):
+        with self._lock:
+            cache = dict(self._cache)
+        names = sorted({name for name, _ in cache})
+        return [
+            {"cache": name, "hit": cache.get((name, "hit"), 0), "miss": cache.get((name, "miss"), 0),
+             "hit_rate": cache.get((name, "hit"), 0) / max(1, cache.get((name, "hit"), 0) + cache.get((name, "miss"), 0))}
+            for name in names
+        ]
+
+    def render_prometheus(self, prefix="legoas"):
+        """Teks format eksposisi Prometheus (tanpa label pengguna agar kardinalitas tetap kecil)."""
+        with self._lock:
+            buckets = {stage: list(counts) for stage, counts in self._bucket_counts.items()}
+            duration_sum = dict(self._duration_sum)
+            calls, errors = dict(self._calls), dict(self._errors)
+            tokens, cost, cache = dict(self._tokens), dict(self._cost), dict(self._cache)
+
+        def total_by_stage(counter):
+            totals = defaultdict(float)
+            for key, value in counter.items():
+                totals[key[0]] += value
+            return totals
+
+        lines = [
+            f"# HELP {prefix}_stage_duration_seconds Durasi per tahap.",
+            f"# TYPE {prefix}_stage_duration_seconds histogram",
+        ]
+        for stage, counts in sorted(buckets.items()):
+            cumulative = 0
+            for bound, count in zip((*map(str, self.buckets), "+Inf"), counts):
+                cumulative += count
+                lines.append(f'{prefix}_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_stage_duration_seconds_sum{{stage="{stage}"}} {duration_sum[stage]:.6f}')
+            lines.append(f'{prefix}_stage_duration_seconds_count{{stage="{stage}"}} {cumulative}')
+        lines += [f"# HELP {prefix}_stage_errors_total Panggilan tahap yang gagal.", f"# TYPE {prefix}_stage_errors_total counter"]
+        error_totals = total_by_stage(errors)
+        lines += [f'{prefix}_stage_errors_total{{stage="{stage}"}} {int(error_totals.get(stage, 0))}' for stage in sorted(total_by_stage(calls))]
+        lines += [f"# HELP {prefix}_llm_tokens_total Token LLM terpakai.", f"# TYPE {prefix}_llm_tokens_total counter"]
+        token_totals = defaultdict(int)
+        for (stage, _, kind), value in tokens.items():
+            token_totals[(stage, kind)] += value
+        lines += [f'{prefix}_llm_tokens_total{{stage="{stage}",kind="{kind}"}} {value}' for (stage, kind), value in sorted(token_totals.items())]
+        lines += [f"# HELP {prefix}_llm_cost_usd_total Biaya LLM yang dilaporkan penyedia.", f"# TYPE {prefix}_llm_cost_usd_total counter"]
+        lines += [f'{prefix}_llm_cost_usd_total{{stage="{stage}"}} {value:.6f}' for stage, value in sorted(total_by_stage(cost).items())]
+        lines += [f"# HELP {prefix}_cache_requests_total Akses cache per hasil.", f"# TYPE {prefix}_cache_requests_total counter"]
+        lines += [f'{prefix}_cache_requests_total{{cache="{name}",result="{result}"}} {value}' for (name, result), value in sorted(cache.items())]
+        return "\n".join(lines) + "\n"
+
+    def export_prometheus(self, path):
+        """Menulis metrik ke file teks (untuk node_exporter textfile collector) secara atomik."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+
+METRICS = StageMetrics()
+
+def start_metrics_exporter(path, interval=15.0, metrics=METRICS):
+    """Thread daemon yang menulis ekspor Prometheus ke path setiap interval detik."""
+    def run():
+        while True:
+            try:
+                metrics.export_prometheus(path)
+            except OSError:
+                logger.exception("Gagal menulis ekspor metrik ke %s", path)
+            time.sleep(interval)
+    thread = threading.Thread(target=run, name="metrics-exporter", daemon=True)
+    thread.start()
+    return thread
+
+# --- Klien HTTP Bersama (Connection Pooling & Retry) ---
+OPENROUTER_CHAT_URL = "https://openrouter.ai/api/v1/chat/completions"
+SERPAPI_SEARCH_URL = "https://serpapi.com/search.json"
+
+# Kebijakan retry per host; POST ke LLM hanya diulang untuk status yang aman diulang
+HTTP_RETRY_POLICIES = {
+    "openrouter": {"total": 2, "backoff_factor": 1.0, "status_forcelist": (429, 502, 503)},
+    "serpapi": {"total": 3, "backoff_factor": 0.5, "status_forcelist": (429, 500, 502, 503, 504)},
+}
+
+@functools.lru_cache(maxsize=None)
+def get_http_session(host):
+    """
+    Satu requests.Session keep-alive per host untuk seluruh proses, sehingga koneksi
+    TCP+TLS dipakai ulang antar panggilan dan antar sesi pengguna.
+    """
+    policy = HTTP_RETRY_POLICIES.get(host, {"total": 2, "backoff_factor": 0.5, "status_forcelist": (429, 502, 503, 504)})
+    retry = Retry(
+        total=policy["total"],
+        backoff_factor=policy["backoff_factor"],
+        status_forcelist=policy["status_forcelist"],
+        allowed_methods=frozenset({"GET", "POST"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    return session
+
+# --- Streaming OpenRouter ---
+def stream_openrouter(messages, api_key, model, **options):
+    """
+    Memanggil chat-completions OpenRouter dengan stream=true (Server-Sent Events) dan
+    menghasilkan potongan teks satu per satu begitu tiba. Error dilempar ke pemanggil.
+    Durasi, waktu ke token pertama, serta token & biaya (dari blok usage terakhir)
+    dicatat ke METRICS.
+    """
+    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+    payload = {"model": model, "messages": messages, "stream": True, "usage": {"include": True}, **options}
+    started = time.perf_counter()
+    first_token = True
+    with METRICS.track("openrouter"), get_http_session("openrouter").post(
+        OPENROUTER_CHAT_URL, headers=headers, json=payload, stream=True, timeout=60
+    ) as response:
+        response.raise_for_status()
+        response.encoding = "utf-8"
+        for line in response.iter_lines(decode_unicode=True):
+            # Baris kosong memisahkan event, baris ":" adalah komentar keep-alive
+            if not line or not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            chunk = json.loads(data)
+            if "error" in chunk:
+                raise RuntimeError(chunk["error"].get("message", chunk["error"]))
+            usage = chunk.get("usage")
+            if usage:
+                METRICS.record_tokens("openrouter", usage.get("prompt_tokens"), usage.get("completion_tokens"), usage.get("cost"))
+            choices = chunk.get("choices") or [{}]
+            content = choices[0].get("delta", {}).get("content")
+            if content:
+                if first_token:
+                    METRICS.observe("openrouter_first_token", time.perf_counter() - started)
+                    first_token = False
+                yield content
+
+class LLMStream:
+    """
+    Aliran teks LLM yang kegagalannya dilaporkan di luar teks. Potongan teks dialirkan
+    apa adanya (bisa langsung ke st.write_stream); bila koneksi atau respons gagal di
+    tengah jalan, aliran berhenti dan pesannya disimpan di error. Setelah aliran habis,
+    ok bernilai True hanya jika tidak ada kegagalan, dan text berisi teks yang diterima.
+    """
+    def __init__(self, chunks, error=None):
+        self._chunks = chunks
+        self.error = error
+        self.text = ""
+        self.done = error is not None
+
+    @classmethod
+    def failed(cls, message):
+        """Aliran kosong yang sudah gagal sejak awal (misal konfigurasi API tidak ada)."""
+        return cls(iter(()), error=message)
+
+    @property
+    def ok(self):
+        return self.done and self.error is None
+
+    def __iter__(self):
+        if self.done:
+            return
+        parts = []
+        try:
+            for chunk in self._chunks:
+                parts.append(chunk)
+                yield chunk
+        except requests.exceptions.RequestException as e:
+            self.error = f"Gagal menghubungi OpenRouter API: {e}"
+        except (KeyError, IndexError, ValueError, RuntimeError) as e:
+            self.error = f"Gagal mengolah respons dari AI: {e}"
+        finally:
+            self.text = "".join(parts)
+        self.done = True
+
+# --- Cache Respons Bertingkat (Memori LRU + SQLite) ---
+CACHE_DB_PATH = os.path.join(".cache", "responses.sqlite3")
+
+class TieredCache:
+    """
+    Cache dua tingkat dengan TTL: LRU di memori proses untuk akses instan, dan tabel
+    SQLite di disk yang dipakai bersama antar proses serta bertahan saat restart.
+    Setiap namespace (misal "llm") memakai baris terpisah di tabel yang sama.
+    """
+    def __init__(self, namespace, max_entries=512, default_ttl=3 * 24 * 3600, db_path=CACHE_DB_PATH):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.db_path = db_path
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL NOT NULL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+            conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+
+    @contextmanager
+    def _connect(self):
+        # Koneksi per operasi: sqlite3 tidak boleh dipakai bersama lintas thread
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @property
+    def hit_rate(self):
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+    def get(self, key):
+        """Mengembalikan nilai yang belum kedaluwarsa, atau None."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    METRICS.record_cache(self.namespace, hit=True)
+                    return entry[1]
+                del self._memory[key]
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ? AND expires_at > ?",
+                    (self.namespace, key, now)
+                ).fetchone()
+        except sqlite3.Error:
+            logger.exception("Gagal membaca cache %s dari disk", self.namespace)
+            row = None
+        with self._lock:
+            if row is None:
+                self.stats["misses"] += 1
+                METRICS.record_cache(self.namespace, hit=False)
+                return None
+            self.stats["disk_hits"] += 1
+            METRICS.record_cache(self.namespace, hit=True)
+            value = json.loads(row[0])
+            self._remember(key, value, row[1])
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Menyimpan nilai (harus bisa di-serialisasi JSON) ke memori dan disk."""
+        expires_at = time.time() + (self.default_ttl if ttl is None else ttl)
+        with self._lock:
+            self._remember(key, value, expires_at)
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                    (self.namespace, key, json.dumps(value, ensure_ascii=False), expires_at)
+                )
+        except sqlite3.Error:
+            logger.exception("Gagal menulis cache %s ke disk", self.namespace)
+
+    def _remember(self, key, value, expires_at):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+def make_cache_key(*parts):
+    """Sidik jari stabil (SHA-256) dari bagian-bagian kunci yang sudah dinormalisasi."""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+# --- Skema Dataset (Deklaratif) ---
+@dataclass(frozen=True)
+class DatasetSchema:
+    """Deklarasi kolom, tipe data, dan kolom kunci untuk satu sumber data."""
+    name: str
+    key_cols: tuple
+    year_col: str
+    price_col: str
+    numeric_cols: tuple
+    thousands: str = ','
+    new_price_col: str = None  # harga baru (OTR) per baris; batas atas harga yang dimodelkan
+
+    @property
+    def string_cols(self):
+        return self.key_cols
+
+CAR_SCHEMA = DatasetSchema(
+    name="mobil",
+    key_cols=('name', 'model', 'varian'),
+    year_col='tahun',
+    price_col='output',
+    numeric_cols=(
+        'harga_terendah', 'harga_baru', 'residu', 'depresiasi',
+        'estimasi', 'depresiasi_2', 'estimasi_2', 'estimasi_3',
+        'avg_estimasi', 'estimator', 'output', 'correction'
+    ),
+    new_price_col='harga_baru',
+)
+
+MOTOR_SCHEMA = DatasetSchema(
+    name="mtr",
+    key_cols=('brand', 'variant'),
+    year_col='year',
+    price_col='output',
+    numeric_cols=(
+        'otr', 'low_price', 'residu', 'depresiasi_1', 'estimasi_1',
+        'depresiasi_2', 'estimasi_2', 'estimasi_3', 'avg_estimasi',
+        'estimator', 'correction', 'output'
+    ),
+    new_price_col='otr',
+)
+
+AVG_SCHEMA = DatasetSchema(
+    name="avg",
+    key_cols=('name', 'model', 'varian'),
+    year_col='vehiclemodeldate',
+    price_col='avg_price',
+    numeric_cols=('avg_price',),
+)
+
+@dataclass
+class IngestReport:
+    """Ringkasan hasil ingest: baris yang dibuang dan nilai yang gagal dikonversi per kolom."""
+    source: str
+    rows_read: int = 0
+    rows_dropped: int = 0
+    coercion_failures: dict = field(default_factory=dict)
+
+    @property
+    def has_issues(self):
+        return self.rows_dropped > 0 or any(self.coercion_failures.values())
+
+def _coerce_numeric(series, thousands):
+    """
+    Mengonversi satu kolom ke numerik. Kolom yang sudah numerik dibiarkan apa adanya;
+    hanya nilai yang gagal pada percobaan pertama yang diproses ulang sebagai teks.
+    """
+    if pd.api.types.is_numeric_dtype(series):
+        return series, 0
+    coerced = pd.to_numeric(series, errors='coerce')
+    retry = coerced.isna() & series.notna()
+    if thousands and retry.any():
+        cleaned = series[retry].astype(str).str.replace(thousands, '', regex=False).str.strip()
+        coerced[retry] = pd.to_numeric(cleaned, errors='coerce')
+    failed = int((coerced.isna() & series.notna()).sum())
+    return coerced, failed
+
+def apply_schema(df, schema):
+    """
+    Menerapkan skema pada DataFrame mentah: merapikan kolom kunci, mengonversi kolom
+    numerik, dan membuang baris yang kunci/tahunnya tidak valid. Nilai numerik yang
+    gagal dikonversi dibiarkan kosong (NaN) dan dihitung di IngestReport, tidak diisi 0.
+    """
+    report = IngestReport(source=schema.name, rows_read=len(df))
+    for col in schema.string_cols:
+        if col in df.columns:
+            df[col] = df[col].astype("string").str.strip()
+
+    for col in (schema.year_col, *schema.numeric_cols):
+        if col in df.columns:
+            df[col], failed = _coerce_numeric(df[col], schema.thousands)
+            if failed:
+                report.coercion_failures[col] = failed
+
+    required = [col for col in (*schema.key_cols, schema.year_col) if col in df.columns]
+    valid = df[required].notna().all(axis=1)
+    if not valid.all():
+        report.rows_dropped = int((~valid).sum())
+        df = df[valid].reset_index(drop=True)
+    if schema.year_col in df.columns:
+        df[schema.year_col] = df[schema.year_col].astype(int)
+
+    if report.has_issues:
+        logger.warning(
+            "Ingest %s: %d dari %d baris dibuang, konversi gagal per kolom: %s",
+            schema.name, report.rows_dropped, report.rows_read, report.coercion_failures
+        )
+    df.attrs["ingest_report"] = report
+    return df
+
+def read_csv_with_schema(path, schema):
+    """Membaca CSV dengan parser bertipe (thousands separator & dtype teks dari skema)."""
+    header = pd.read_csv(path, nrows=0, encoding='utf-8-sig').columns
+    normalized = {raw: raw.strip().lower() for raw in header}
+    dtype = {raw: "string" for raw, col in normalized.items() if col in schema.string_cols}
+    df = pd.read_csv(path, encoding='utf-8-sig', thousands=schema.thousands, dtype=dtype)
+    df.columns = [normalized[raw] for raw in df.columns]
+    return apply_schema(df, schema)
+
+# --- Snapshot Lokal (Feather) untuk Cold Start Cepat ---
+SNAPSHOT_DIR = os.path.join(".cache", "snapshots")
+# Kunci metadata skema Arrow untuk IngestReport, agar laporan ingest ikut pulih saat warm start
+SNAPSHOT_REPORT_KEY = b"legoas.ingest_report"
+
+def _snapshot_path(name, revision):
+    digest = hashlib.sha1(str(revision).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(SNAPSHOT_DIR, f"{name}-{digest}.feather")
+
+def local_file_revision(path):
+    """Penanda revisi file lokal berdasarkan waktu modifikasi dan ukuran file."""
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+def read_snapshot(name, revision=None):
+    """
+    Membaca snapshot hasil pembersihan untuk revisi tertentu (memory-mapped, tanpa parsing ulang)
+    beserta IngestReport-nya di df.attrs. Snapshot lama tanpa laporan ingest dianggap tidak ada,
+    sehingga dibangun ulang sekali dari sumber. Tanpa revisi, snapshot terbaru yang tersedia
+    dipakai sebagai cadangan saat sumber tidak bisa dihubungi.
+    """
+    if revision is not None:
+        path = _snapshot_path(name, revision)
+    else:
+        try:
+            candidates = [
+                os.path.join(SNAPSHOT_DIR, f) for f in os.listdir(SNAPSHOT_DIR)
+                if f.startswith(f"{name}-") and f.endswith(".feather")
+            ]
+        except FileNotFoundError:
+            return None
+        if not candidates:
+            return None
+        try:
+            path = max(candidates, key=os.path.getmtime)
+        except FileNotFoundError:
+            return None  # kandidat dihapus proses lain di tengah pemindaian
+    if not os.path.exists(path):
+        return None
+    import pyarrow.feather as feather
+    try:
+        table = feather.read_table(path, memory_map=True)
+        df = table.to_pandas()
+        report = (table.schema.metadata or {}).get(SNAPSHOT_REPORT_KEY)
+        if report is None:
+            return None if revision is not None else df
+        df.attrs["ingest_report"] = IngestReport(**json.loads(report))
+        return df
+    except Exception:
+        logger.exception("Snapshot %s rusak, data akan dimuat ulang dari sumber", path)
+        return None
+
+def write_snapshot(name, revision, df):
+    """
+    Menyimpan snapshot secara atomik dan menghapus snapshot lama dengan nama yang sama.
+    IngestReport di df.attrs disimpan sebagai metadata skema Arrow (dibaca lagi oleh read_snapshot).
+    """
+    if df.empty:
+        return
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    path = _snapshot_path(name, revision)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        frame = df.reset_index(drop=True)
+        report = frame.attrs.get("ingest_report")
+        frame.attrs = {}
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        if report is not None:
+            metadata = {**(table.schema.metadata or {}), SNAPSHOT_REPORT_KEY: json.dumps(asdict(report)).encode("utf-8")}
+            table = table.replace_schema_metadata(metadata)
+        # Tanpa kompresi agar bisa dibaca zero-copy lewat memory map
+        feather.write_feather(table, tmp_path, compression="uncompressed")
+        os.replace(tmp_path, path)
+    except Exception:
+        logger.exception("Gagal menulis snapshot %s", path)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return
+    for f in os.listdir(SNAPSHOT_DIR):
+        old_path = os.path.join(SNAPSHOT_DIR, f)
+        if f.startswith(f"{name}-") and f.endswith(".feather") and old_path != path:
+            # Proses lain (worker layanan / aplikasi Streamlit) bisa menghapus file yang sama lebih dulu
+            with suppress(FileNotFoundError):
+                os.remove(old_path)
+
+# --- Fungsi Pemuatan Data Otomotif ---
+def get_drive_service(creds_info):
+    """Membangun klien Google Drive dari kredensial service account."""
+    from google.oauth2.service_account import Credentials
+    from googleapiclient.discovery import build
+    creds = Credentials.from_service_account_info(creds_info)
+    return build('drive', 'v3', credentials=creds)
+
+@METRICS.timed("drive_revision")
+def get_drive_file_revision(service, file_id):
+    """Mengambil penanda revisi file Drive (md5Checksum, atau modifiedTime sebagai cadangan)."""
+    metadata = service.files().get(fileId=file_id, fields="modifiedTime,md5Checksum").execute()
+    return metadata.get("md5Checksum") or metadata.get("modifiedTime")
+
+@METRICS.timed("drive_download")
+def load_data_from_drive(service, file_id):
+    """
+    Mengunduh dan memuat data mobil dari Google Drive dengan pembersihan data.
+    Error tidak ditangkap di sini agar pemanggil (registry) bisa tetap memakai versi lama.
+    """
+    from googleapiclient.http import MediaIoBaseDownload
+    request = service.files().get_media(fileId=file_id)
+    file_stream = io.BytesIO()
+    downloader = MediaIoBaseDownload(file_stream, request)
+    done = False
+    while not done:
+        status, done = downloader.next_chunk()
+
+    file_stream.seek(0)
+    return apply_schema(pd.read_json(file_stream, encoding='utf-8-sig'), CAR_SCHEMA)
+
+@METRICS.timed("load_local_data")
+def load_local_data(path, schema):
+    """
+    Memuat data lokal (motor, rata-rata pasar) sesuai skemanya. Hasil bersihnya
+    disimpan sebagai snapshot Feather yang dikunci dengan revisi file CSV.
+    """
+    # Hanya file sumber yang hilang yang berarti "data tidak ada"; error snapshot tidak ikut tertelan
+    try:
+        revision = local_file_revision(path)
+    except FileNotFoundError:
+        logger.error("File data tidak ditemukan di path: %s", path)
+        return pd.DataFrame()
+    cached = read_snapshot(schema.name, revision)
+    if cached is not None:
+        return cached
+
+    try:
+        df = read_csv_with_schema(path, schema)
+    except FileNotFoundError:
+        logger.error("File data tidak ditemukan di path: %s", path)
+        return pd.DataFrame()
+    write_snapshot(schema.name, revision, df)
+    return df
+
+# --- Indeks Pencarian Bertingkat (Cascading Selectbox) ---
+def _sort_and_freeze_index(node, depth):
+    """Mengurutkan setiap level indeks dan membekukannya menjadi mapping read-only."""
+    if depth == 0:
+        # Level terakhir: tahun -> posisi baris, diurutkan dari tahun terbaru
+        return MappingProxyType(dict(sorted(node.items(), reverse=True)))
+    return MappingProxyType({key: _sort_and_freeze_index(node[key], depth - 1) for key in sorted(node)})
+
+def build_lookup_index(df, levels, year_col):
+    """
+    Membangun indeks bertingkat (misal brand -> model -> varian -> tahun -> posisi baris)
+    dalam satu kali lintasan data. Opsi setiap selectbox cukup dibaca dengan list(...)
+    karena tiap level sudah terurut, dan posisi baris menunjuk kemunculan pertama
+    kombinasi tersebut (setara dengan results.iloc[0]).
+    """
+    if df.empty or any(col not in df.columns for col in (*levels, year_col)):
+        return MappingProxyType({})
+
+    index = {}
+    columns = [df[col].tolist() for col in levels] + [df[year_col].astype(int).tolist()]
+    for position, values in enumerate(zip(*columns)):
+        node = index
+        for value in values[:-1]:
+            node = node.setdefault(value, {})
+        node.setdefault(values[-1], position)
+    return _sort_and_freeze_index(index, depth=len(levels))
+
+def get_index_options(index, *path):
+    """Mengembalikan daftar opsi terurut pada level indeks yang ditunjuk oleh path."""
+    node = index
+    for key in path:
+        node = node.get(key)
+        if node is None:
+            return []
+    return list(node)
+
+def lookup_row_position(index, *path):
+    """Mengembalikan posisi baris untuk kombinasi lengkap, atau None jika tidak ada."""
+    node = index
+    for key in path:
+        node = node.get(key)
+        if node is None:
+            return None
+    return node
+
+def resolve_index_keys(index, *keys):
+    """
+    Mencocokkan kunci masukan ke kunci kanonis indeks per level tanpa peduli huruf besar/kecil
+    dan spasi tepi (sama seperti join di price_lot). Mengembalikan daftar kunci kanonis,
+    atau None jika salah satu level tidak cocok.
+    """
+    node, resolved = index, []
+    for key in keys:
+        if key in node:
+            match = key
+        else:
+            wanted = str(key).strip().lower()
+            match = next((candidate for candidate in node if str(candidate).strip().lower() == wanted), None)
+            if match is None:
+                return None
+        resolved.append(match)
+        node = node[match]
+    return resolved
+
+# --- Indeks Pencocokan Fuzzy (Toleran Typo) ---
+_NON_ALNUM_PATTERN = re.compile(r'[^0-9a-z.]+')
+_YEAR_PATTERN = re.compile(r'\b(19[5-9]\d|20\d{2})\b')
+
+def normalize_vehicle_text(text):
+    """Huruf kecil, buang tanda baca selain titik, dan rapatkan spasi ganda."""
+    return _NON_ALNUM_PATTERN.sub(' ', str(text).lower()).strip()
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class FuzzyVehicleIndex:
+    """
+    Indeks trigram karakter atas gabungan kolom kunci (misal name+model+varian).
+    Dibangun sekali per versi dataset; setiap query hanya menjumlahkan posting list
+    trigram dengan np.bincount lalu mengurutkan skor Dice, sehingga cukup beberapa
+    milidetik bahkan untuk ribuan keluarga varian.
+    """
+    def __init__(self, df, schema):
+        self.schema = schema
+        self.families = []
+        self._years = []
+        self._positions = []
+        postings = {}
+        gram_counts = []
+        if not df.empty:
+            keys = list(zip(*(df[col].tolist() for col in schema.key_cols)))
+            years = df[schema.year_col].to_numpy()
+            family_ids = {}
+            family_rows = []
+            for position, key in enumerate(keys):
+                family_id = family_ids.get(key)
+                if family_id is None:
+                    family_id = family_ids[key] = len(self.families)
+                    self.families.append(key)
+                    family_rows.append([])
+                family_rows[family_id].append(position)
+            for family_id, key in enumerate(self.families):
+                rows = np.asarray(family_rows[family_id])
+                # Satu posisi per tahun (kemunculan pertama), diurutkan menurut tahun
+                family_years, first = np.unique(years[rows], return_index=True)
+                self._years.append(family_years.astype(int))
+                self._positions.append(rows[first])
+                grams = _trigrams(normalize_vehicle_text(" ".join(map(str, key))))
+                gram_counts.append(len(grams))
+                for gram in grams:
+                    postings.setdefault(gram, []).append(family_id)
+        self._postings = {gram: np.asarray(ids, dtype=np.int32) for gram, ids in postings.items()}
+        self._gram_counts = np.asarray(gram_counts, dtype=np.float64)
+
+    def search(self, query, year=None, limit=5, min_score=0.3):
+        """
+        Mengembalikan kandidat terdekat untuk teks bebas. Tahun empat digit di dalam
+        query dipakai sebagai preferensi tahun bila argumen year tidak diberikan.
+        """
+        if not self.families:
+            return []
+        text = normalize_vehicle_text(query)
+        if year is None:
+            match = _YEAR_PATTERN.search(text)
+            if match:
+                year = int(match.group(1))
+                text = (text[:match.start()] + text[match.end():]).strip()
+        grams = _trigrams(text)
+        hits = [self._postings[gram] for gram in grams if gram in self._postings]
+        if not hits:
+            return []
+
+        overlap = np.bincount(np.concatenate(hits), minlength=len(self.families))
+        scores = 2.0 * overlap / (len(grams) + self._gram_counts)
+        limit = min(limit, len(scores))
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+
+        candidates = []
+        for family_id in top:
+            score = float(scores[family_id])
+            if score < min_score:
+                continue
+            family_years = self._years[family_id]
+            if year is None:
+                pick = len(family_years) - 1  # tanpa preferensi: tahun terbaru
+            else:
+                pick = int(np.argmin(np.abs(family_years - int(year))))
+            candidate = dict(zip(self.schema.key_cols, self.families[family_id]))
+            candidate[self.schema.year_col] = int(family_years[pick])
+            candidate["row_position"] = int(self._positions[family_id][pick])
+            candidate["score"] = round(score, 3)
+            candidates.append(candidate)
+        return candidates
+
+    def search_many(self, queries, years=None, limit=1):
+        """Versi massal dari search() untuk banyak baris sekaligus (misal baris lot yang tidak cocok)."""
+        years = years if years is not None else [None] * len(queries)
+        return [self.search(query, year=year, limit=limit) for query, year in zip(queries, years)]
+
+# --- Matriks Harga per Grade (Dihitung Saat Muat) ---
+def resolve_grade_factors(overrides=None):
+    """
+    Vektor faktor grade A-E. overrides (misal dari secrets [grade_factors.<kategori>])
+    menimpa GRADE_FACTORS per huruf grade; huruf yang tidak disebut memakai default.
+    """
+    factors = {**GRADE_LETTER_FACTORS, **{str(k).upper(): float(v) for k, v in (overrides or {}).items()}}
+    return np.array([factors[letter] for letter in GRADE_LETTERS], dtype=np.float64)
+
+@dataclass(frozen=True)
+class GradePriceMatrix:
+    """
+    Harga akhir seluruh baris dataset untuk tiap grade (baris x grade A-E) dalam satu
+    array NumPy contiguous. Lookup tunggal, batch, ekspor, dan API membaca array yang
+    sama; mengganti faktor cukup mengalikan ulang kolom harga dasar, tanpa ingest ulang.
+    """
+    base: np.ndarray
+    factors: np.ndarray
+    prices: np.ndarray
+
+    @classmethod
+    def build(cls, base_prices, factors):
+        base = np.ascontiguousarray(np.asarray(base_prices, dtype=np.float64))
+        factors = np.asarray(factors, dtype=np.float64)
+        prices = np.multiply.outer(base, factors)  # hasil outer sudah C-contiguous
+        base.flags.writeable = False
+        prices.flags.writeable = False
+        return cls(base=base, factors=factors, prices=prices)
+
+    def with_factors(self, factors):
+        """Matriks baru dengan faktor lain; mengembalikan self bila faktornya sama."""
+        factors = np.asarray(factors, dtype=np.float64)
+        if np.array_equal(factors, self.factors):
+            return self
+        return GradePriceMatrix.build(self.base, factors)
+
+    def factor(self, grade):
+        """Faktor pengali untuk satu grade ('A'-'E' atau label lengkap 'A (Sangat Baik)')."""
+        return float(self.factors[GRADE_LETTERS.index(str(grade)[0].upper())])
+
+    def price(self, row, grade):
+        """Harga satu baris untuk satu grade ('A'-'E' atau label lengkap 'A (Sangat Baik)')."""
+        return float(self.prices[row, GRADE_LETTERS.index(str(grade)[0].upper())])
+
+    def lookup(self, rows, grade_letters):
+        """
+        Harga banyak baris sekaligus lewat indeks vektor. Baris < 0 (tidak cocok) atau
+        grade di luar A-E menghasilkan NaN. Mengembalikan (harga, faktor per baris).
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        grade_index = pd.Index(GRADE_LETTERS).get_indexer(pd.Series(grade_letters, dtype=object).to_numpy())
+        valid_grade = grade_index >= 0
+        valid = (rows >= 0) & valid_grade
+        prices = np.full(len(rows), np.nan)
+        prices[valid] = self.prices[rows[valid], grade_index[valid]]
+        factors = np.where(valid_grade, self.factors[np.clip(grade_index, 0, None)], np.nan)
+        return prices, factors
+
+# --- Model Depresiasi per Keluarga Varian (Tahun yang Tidak Ada di Dataset) ---
+# Batas kemiringan log-harga per tahun (~1%-30% penyusutan per tahun). Kemiringan hasil
+# fit di luar batas dijepit; keluarga dengan satu tahun saja memakai median seluruh tabel.
+DEPRECIATION_SLOPE_BOUNDS = (0.01, 0.35)
+DEPRECIATION_DEFAULT_SLOPE = 0.12
+# Tahun setelah tahun teramati terakhir yang masih boleh diekstrapolasi; tahun sebelum
+# tahun teramati pertama tidak pernah diberi harga.
+DEPRECIATION_MAX_EXTRAPOLATION_YEARS = 3
+_YEAR_SPAN = 4096  # kunci gabungan keluarga*_YEAR_SPAN + tahun tetap terurut per keluarga
+
+@dataclass(frozen=True)
+class DepreciationModel:
+    """
+    Kurva depresiasi per keluarga varian (kolom kunci skema tanpa tahun), di-fit sekali
+    saat muat dari harga akhir yang teramati. Disimpan sebagai array ringkas: titik
+    (tahun, log-harga) terurut per keluarga dengan offset CSR, plus satu kemiringan
+    log-harga per tahun untuk tiap keluarga.
+
+    Tahun di antara dua tahun teramati diinterpolasi linear pada log-harga; tahun setelah
+    tahun teramati terakhir diekstrapolasi dengan kemiringan keluarga, paling jauh
+    DEPRECIATION_MAX_EXTRAPOLATION_YEARS tahun. Tahun sebelum tahun teramati pertama tidak
+    diberi harga. Harga yang dimodelkan tidak pernah melebihi harga baru (kolom
+    new_price_col) tertinggi keluarga tersebut, dan selalu diberi tanda "dimodelkan"
+    kecuali tahunnya memang ada di dataset.
+    """
+    family_ids: MappingProxyType
+    offsets: np.ndarray
+    keys: np.ndarray
+    log_prices: np.ndarray
+    slopes: np.ndarray
+    new_prices: np.ndarray
+
+    @classmethod
+    def fit(cls, df, schema):
+        columns = (*schema.key_cols, schema.year_col, schema.price_col)
+        if df.empty or any(col not in df.columns for col in columns):
+            return cls.empty()
+        prices = df[schema.price_col].to_numpy(dtype=np.float64)
+        years = df[schema.year_col].to_numpy(dtype=np.int64)
+        valid = np.isfinite(prices) & (prices > 0)
+        if not valid.any():
+            return cls.empty()
+
+        family = df.groupby(list(schema.key_cols), observed=True, sort=False).ngroup().to_numpy()
+        valid &= family >= 0
+        # Tahun ganda dalam satu keluarga dirata-rata pada skala log
+        points = (
+            pd.DataFrame({"family": family[valid], "year": years[valid], "log_price": np.log(prices[valid])})
+            .groupby(["family", "year"], sort=True)["log_price"].mean()
+        )
+        raw_family = points.index.get_level_values("family").to_numpy()
+        point_years = points.index.get_level_values("year").to_numpy(dtype=np.int64)
+        log_prices = points.to_numpy(dtype=np.float64)
+        family_codes, dense = np.unique(raw_family, return_inverse=True)
+        counts = np.bincount(dense, minlength=len(family_codes))
+        offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+
+        # Regresi log-harga terhadap tahun untuk semua keluarga sekaligus (jumlah via bincount)
+        x = (point_years - point_years[offsets[dense]]).astype(np.float64)
+        sx = np.bincount(dense, x)
+        sy = np.bincount(dense, log_prices)
+        sxx = np.bincount(dense, x * x)
+        sxy = np.bincount(dense, x * log_prices)
+        denom = counts * sxx - sx * sx
+        with np.errstate(divide="ignore", invalid="ignore"):
+            slopes = np.where(denom > 0, (counts * sxy - sx * sy) / denom, np.nan)
+        fitted = np.isfinite(slopes) & (slopes > 0)
+        low, high = DEPRECIATION_SLOPE_BOUNDS
+        default = float(np.clip(np.median(slopes[fitted]), low, high)) if fitted.any() else DEPRECIATION_DEFAULT_SLOPE
+        slopes = np.where(fitted, np.clip(slopes, low, high), default)
+
+        first_rows = pd.Series(np.arange(len(df))).groupby(family).first()
+        family_keys = df[list(schema.key_cols)].iloc[first_rows.loc[family_codes].to_numpy()]
+        family_ids = {tuple(keys): fid for fid, keys in enumerate(family_keys.itertuples(index=False, name=None))}
+
+        # Harga baru tertinggi per keluarga sebagai batas atas; NaN bila kolomnya tidak ada
+        new_prices = np.full(len(family_codes), np.nan)
+        if schema.new_price_col in df.columns:
+            new_price = df[schema.new_price_col].to_numpy(dtype=np.float64)
+            known = np.isfinite(new_price) & (new_price > 0) & (family >= 0)
+            new_prices = pd.Series(new_price[known]).groupby(family[known]).max().reindex(family_codes).to_numpy()
+        return cls._frozen(family_ids, offsets, dense * _YEAR_SPAN + point_years, log_prices, slopes, new_prices)
+
+    @classmethod
+    def empty(cls):
+        return cls._frozen({}, np.zeros(1), np.zeros(0), np.zeros(0), np.zeros(0), np.zeros(0))
+
+    @classmethod
+    def _frozen(cls, family_ids, offsets, keys, log_prices, slopes, new_prices):
+        arrays = [
+            np.ascontiguousarray(offsets, dtype=np.int32),
+            np.ascontiguousarray(keys, dtype=np.int64),
+            np.ascontiguousarray(log_prices, dtype=np.float32),
+            np.ascontiguousarray(slopes, dtype=np.float32),
+            np.ascontiguousarray(new_prices, dtype=np.float64),
+        ]
+        for array in arrays:
+            array.flags.writeable = False
+        return cls(MappingProxyType(family_ids), *arrays)
+
+    def family_id(self, *keys):
+        """Nomor keluarga untuk kombinasi kolom kunci, atau None jika tidak dikenal."""
+        return self.family_ids.get(keys)
+
+    def year_range(self, family_id):
+        """(tahun pertama, tahun terakhir) yang bisa diberi harga untuk satu keluarga."""
+        first = int(self.keys[self.offsets[family_id]]) % _YEAR_SPAN
+        last = int(self.keys[self.offsets[family_id + 1] - 1]) % _YEAR_SPAN
+        return first, last + DEPRECIATION_MAX_EXTRAPOLATION_YEARS
+
+    def predict(self, family_ids, years):
+        """
+        Harga untuk banyak (keluarga, tahun) sekaligus. family_ids < 0, tahun kosong, atau
+        tahun di luar year_range() menghasilkan NaN. Mengembalikan (harga, dimodelkan) dengan
+        dimodelkan=True hanya untuk harga hasil model (bukan tahun yang teramati).
+        """
+        family_ids = np.asarray(family_ids, dtype=np.int64)
+        years = np.asarray(years, dtype=np.float64)
+        prices = np.full(len(family_ids), np.nan)
+        modeled = np.zeros(len(family_ids), dtype=bool)
+        known = (family_ids >= 0) & np.isfinite(years)
+        if not known.any():
+            return prices, modeled
+
+        family, year = family_ids[known], years[known].astype(np.int64)
+        start, last = self.offsets[family], self.offsets[family + 1] - 1
+        right = np.searchsorted(self.keys, family * _YEAR_SPAN + year)
+        exact = (right <= last) & (self.keys[np.minimum(right, last)] % _YEAR_SPAN == year)
+        before, after = right == start, right > last
+        left = np.clip(right - 1, start, last)
+        right = np.clip(right, start, last)
+
+        year_left = self.keys[left] % _YEAR_SPAN
+        year_right = self.keys[right] % _YEAR_SPAN
+        log_left = self.log_prices[left].astype(np.float64)
+        log_right = self.log_prices[right].astype(np.float64)
+        slope = self.slopes[family].astype(np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            weight = np.where(year_right > year_left, (year - year_left) / (year_right - year_left), 0.0)
+        log_price = np.select(
+            [exact, before, after],
+            [log_right, np.nan, log_left + slope * (year - year_left)],
+            log_left + weight * (log_right - log_left),
+        )
+        # Tahun sebelum tahun teramati pertama atau terlalu jauh setelah yang terakhir tidak diberi harga
+        log_price[after & (year - year_left > DEPRECIATION_MAX_EXTRAPOLATION_YEARS)] = np.nan
+        estimate = np.round(np.exp(log_price))  # harga dalam rupiah utuh
+        # Harga model dibatasi harga baru keluarga (bila diketahui); tahun tanpa harga tetap NaN
+        cap = self.new_prices[family]
+        estimate = np.where(exact | np.isnan(cap), estimate, np.minimum(estimate, cap))
+        prices[known] = estimate
+        modeled[known] = ~exact & np.isfinite(estimate)
+        return prices, modeled
+
+    def price(self, keys, year):
+        """
+        Harga satu kendaraan; (harga, dimodelkan) atau None jika keluarganya tidak dikenal
+        atau tahunnya di luar year_range(). Jalur skalar dari predict() tanpa array
+        sementara, untuk lookup interaktif.
+        """
+        family_id = self.family_id(*keys)
+        if family_id is None:
+            return None
+        year = int(year)
+        start, last = int(self.offsets[family_id]), int(self.offsets[family_id + 1]) - 1
+        right = int(self.keys.searchsorted(family_id * _YEAR_SPAN + year))
+        slope = float(self.slopes[family_id])
+
+        def point(i):
+            return int(self.keys[i]) % _YEAR_SPAN, float(self.log_prices[i])
+
+        if right <= last and point(right)[0] == year:
+            return float(round(math.exp(point(right)[1]))), False
+        if right == start:
+            return None
+        if right > last:
+            year_left, log_left = point(last)
+            if year - year_left > DEPRECIATION_MAX_EXTRAPOLATION_YEARS:
+                return None
+            log_price = log_left + slope * (year - year_left)
+        else:
+            (year_left, log_left), (year_right, log_right) = point(right - 1), point(right)
+            log_price = log_left + (year - year_left) / (year_right - year_left) * (log_right - log_left)
+        price = float(round(math.exp(log_price)))
+        new_price = float(self.new_prices[family_id])
+        return (min(price, new_price) if math.isfinite(new_price) else price), True
+
+# --- Registry Dataset Bersama (Satu Salinan per Proses) ---
+def compact_dtypes(df, schema):
+    """Mengecilkan tipe data: kolom teks berulang menjadi category, tahun menjadi int16."""
+    for col in schema.string_cols:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    if schema.year_col in df.columns:
+        df[schema.year_col] = df[schema.year_col].astype(np.int16)
+    return df
+
+MARKET_AVG_COL = "avg_price"
+
+def _market_key_part(series):
+    """Menormalkan satu kolom kunci; untuk kolom category cukup kategori uniknya yang diproses."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        normalized = np.asarray(series.cat.categories.map(normalize_vehicle_text), dtype=object)
+        return normalized[series.cat.codes.to_numpy()]
+    return series.astype("string").fillna("").map(normalize_vehicle_text).to_numpy()
+
+def build_market_key(df, schema):
+    """Kunci gabung ternormalisasi (merek|model|varian|tahun) yang tahan spasi ganda dan beda huruf."""
+    parts = [_market_key_part(df[col]) for col in schema.key_cols]
+    parts.append(df[schema.year_col].astype(str).to_numpy())
+    key = parts[0].astype(object)
+    for part in parts[1:]:
+        key = key + "|" + part
+    return pd.Series(key, index=df.index)
+
+def attach_market_average(df_mobil, df_avg):
+    """
+    Menempelkan rata-rata harga pasar (dt/avg.csv) ke tabel mobil satu kali saat dimuat.
+    Entri rata-rata dengan kunci ternormalisasi yang sama dirata-ratakan lebih dulu;
+    mobil tanpa pasangan mendapat NaN.
+    """
+    if df_mobil.empty:
+        return df_mobil
+    if df_avg.empty:
+        df_mobil[MARKET_AVG_COL] = np.nan
+        return df_mobil
+    averages = df_avg[AVG_SCHEMA.price_col].groupby(build_market_key(df_avg, AVG_SCHEMA).to_numpy()).mean()
+    df_mobil[MARKET_AVG_COL] = build_market_key(df_mobil, CAR_SCHEMA).map(averages).astype(float).to_numpy()
+    return df_mobil
+
+@dataclass(frozen=True)
+class DatasetSnapshot:
+    """Satu versi dataset yang sudah bersih dan read-only, dibagikan ke semua sesi."""
+    version: int
+    car_revision: str
+    df_mobil: pd.DataFrame
+    df_motor: pd.DataFrame
+    car_index: MappingProxyType
+    motor_index: MappingProxyType
+    car_fuzzy: FuzzyVehicleIndex
+    motor_fuzzy: FuzzyVehicleIndex
+    car_prices: GradePriceMatrix
+    motor_prices: GradePriceMatrix
+    car_depreciation: DepreciationModel
+    motor_depreciation: DepreciationModel
+    _option_cache: dict = field(default_factory=dict, repr=False, compare=False)
+
+    def select_options(self, kind, *path):
+        """
+        Opsi selectbox bertingkat ("-" diikuti opsi pada level path) untuk "mobil" atau "motor".
+        Di level tahun, tahun kosong di antara tahun teramati dan beberapa tahun setelah tahun
+        teramati terakhir (sesuai DepreciationModel.year_range, paling jauh tahun berjalan) ikut
+        ditawarkan; harganya berasal dari model depresiasi.
+        Dimemo per snapshot, sehingga rerun dengan pilihan yang sama tidak menyusun ulang daftar.
+        """
+        key = (kind, path)
+        options = self._option_cache.get(key)
+        if options is None:
+            if kind == "mobil":
+                index, depreciation = self.car_index, self.car_depreciation
+            else:
+                index, depreciation = self.motor_index, self.motor_depreciation
+            values = get_index_options(index, *path)
+            family_id = depreciation.family_id(*path)
+            if family_id is not None:
+                first, last = depreciation.year_range(family_id)
+                newest = max(min(last, pd.Timestamp.now().year), max(values, default=first))
+                values = range(newest, first - 1, -1)
+            options = ("-",) + tuple(str(option) for option in values)
+            self._option_cache[key] = options
+        return options
+
+class DatasetRegistry:
+    """
+    Registry dataset tingkat proses. Tabel mobil & motor dimuat sekali lalu dipakai
+    bersama oleh seluruh sesi; sesi hanya menyimpan nomor versi snapshot.
+
+    Setelah pemuatan awal, thread latar belakang memeriksa revisi file mobil di Drive
+    secara berkala dan hanya mengunduh ulang bila file berubah. Snapshot baru dipasang
+    dengan satu penggantian referensi, sehingga pengguna tetap dilayani versi lama
+    sampai versi baru siap (stale-while-revalidate).
+    """
+    def __init__(self, car_file_id, motor_path, avg_path=None, refresh_interval=300, grade_factors=None,
+                 drive_credentials=None):
+        self.car_file_id = car_file_id
+        self.motor_path = motor_path
+        self.avg_path = avg_path
+        self.grade_factors = grade_factors or {}
+        self.drive_credentials = drive_credentials
+        self.refresh_interval = refresh_interval
+        self.last_error = None
+        self.ingest_reports = {}
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._drive_service = None
+        self._refresher = None
+        self._df_avg = None
+
+    @property
+    def snapshot(self):
+        """Snapshot aktif saat ini (None jika belum pernah dimuat)."""
+        return self._snapshot
+
+    def ensure_loaded(self):
+        """Memuat snapshot pertama kali; pemanggil berikutnya langsung mendapat versi aktif."""
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+        with self._lock:
+            # Periksa ulang setelah mendapat lock, sesi lain mungkin sudah memuatnya
+            if self._snapshot is None:
+                df_motor = compact_dtypes(load_local_data(self.motor_path, MOTOR_SCHEMA), MOTOR_SCHEMA)
+                try:
+                    revision, df_mobil = self._fetch_car_data()
+                except Exception as e:
+                    # Data motor tetap bisa dipakai; refresher akan mencoba lagi nanti
+                    logger.exception("Gagal memuat data mobil dari Google Drive")
+                    self.last_error = e
+                    revision, df_mobil = None, pd.DataFrame()
+                self._publish(revision, df_mobil, df_motor)
+            return self._snapshot
+
+    def refresh_if_changed(self):
+        """Mengunduh ulang data mobil hanya jika revisi file di Drive sudah berubah."""
+        with self._lock:
+            current = self._snapshot
+            revision = get_drive_file_revision(self._service(), self.car_file_id)
+            if current is not None and revision == current.car_revision:
+                return False
+            revision, df_mobil = self._fetch_car_data(revision)
+            self._publish(revision, df_mobil, current.df_motor if current is not None else None)
+            self.last_error = None
+            return True
+
+    def set_grade_factors(self, grade_factors):
+        """
+        Mengganti faktor grade per kategori (misal setelah secrets diubah) tanpa ingest ulang:
+        matriks harga dikalikan ulang dari harga dasarnya lewat with_factors() dan dipasang
+        sebagai snapshot versi baru. Mengembalikan True hanya bila snapshot baru dipasang.
+        """
+        factors = {name: np.asarray(values, dtype=np.float64) for name, values in grade_factors.items()}
+        if factors.keys() == self.grade_factors.keys() and all(
+            np.array_equal(values, self.grade_factors[name]) for name, values in factors.items()
+        ):
+            return False
+        with self._lock:
+            self.grade_factors = factors
+            current = self._snapshot
+            if current is None:
+                return False
+            car_prices = current.car_prices.with_factors(self._grade_factors_for(CAR_SCHEMA))
+            motor_prices = current.motor_prices.with_factors(self._grade_factors_for(MOTOR_SCHEMA))
+            if car_prices is current.car_prices and motor_prices is current.motor_prices:
+                return False
+            self._snapshot = replace(current, version=current.version + 1, car_prices=car_prices, motor_prices=motor_prices)
+            return True
+
+    def start_background_refresh(self):
+        """Menjalankan thread daemon yang memeriksa perubahan data mobil secara berkala."""
+        if self._refresher is None:
+            self._refresher = threading.Thread(target=self._refresh_loop, name="dataset-refresher", daemon=True)
+            self._refresher.start()
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(self.refresh_interval)
+            try:
+                self.refresh_if_changed()
+            except Exception as e:
+                logger.exception("Refresh data mobil gagal, tetap memakai versi lama")
+                self.last_error = e
+
+    def _service(self):
+        # Klien Drive tidak thread-safe; hanya dipakai selama memegang self._lock
+        if self._drive_service is None:
+            self._drive_service = get_drive_service(self.drive_credentials)
+        return self._drive_service
+
+    def _fetch_car_data(self, revision=None):
+        if revision is None:
+            try:
+                revision = get_drive_file_revision(self._service(), self.car_file_id)
+            except Exception:
+                # Drive tidak bisa dihubungi saat start: pakai snapshot lokal terakhir jika ada
+                df_mobil = read_snapshot(CAR_SCHEMA.name)
+                if df_mobil is None:
+                    raise
+                logger.warning("Google Drive tidak bisa dihubungi, memakai snapshot lokal data mobil")
+                return None, compact_dtypes(df_mobil, CAR_SCHEMA)
+
+        # Drive hanya diunduh jika snapshot untuk revisi ini belum ada
+        df_mobil = read_snapshot(CAR_SCHEMA.name, revision)
+        if df_mobil is None:
+            df_mobil = load_data_from_drive(self._service(), self.car_file_id)
+            write_snapshot(CAR_SCHEMA.name, revision, df_mobil)
+        return revision, compact_dtypes(df_mobil, CAR_SCHEMA)
+
+    def _market_averages(self):
+        # Tabel rata-rata pasar lokal dimuat sekali per proses, dipakai ulang tiap refresh data mobil
+        if self._df_avg is None:
+            self._df_avg = load_local_data(self.avg_path, AVG_SCHEMA) if self.avg_path else pd.DataFrame()
+        return self._df_avg
+
+    @METRICS.timed("dataset_publish")
+    def _publish(self, car_revision, df_mobil, df_motor=None):
+        current = self._snapshot
+        if df_motor is None:
+            df_motor = compact_dtypes(load_local_data(self.motor_path, MOTOR_SCHEMA), MOTOR_SCHEMA)
+        df_avg = self._market_averages()
+        df_mobil = attach_market_average(df_mobil, df_avg)
+        for df in (df_mobil, df_motor, df_avg):
+            report = df.attrs.get("ingest_report")
+            if report is not None:
+                self.ingest_reports[report.source] = report
+        if current is not None and current.df_motor is df_motor:
+            motor_index, motor_fuzzy, motor_prices = current.motor_index, current.motor_fuzzy, current.motor_prices
+            motor_depreciation = current.motor_depreciation
+        else:
+            motor_index = build_lookup_index(df_motor, MOTOR_SCHEMA.key_cols, MOTOR_SCHEMA.year_col)
+            motor_fuzzy = FuzzyVehicleIndex(df_motor, MOTOR_SCHEMA)
+            motor_prices = self._price_matrix(df_motor, MOTOR_SCHEMA)
+            motor_depreciation = DepreciationModel.fit(df_motor, MOTOR_SCHEMA)
+        # Penggantian referensi tunggal: pembaca melihat snapshot lama atau baru, tidak pernah setengah jadi
+        self._snapshot = DatasetSnapshot(
+            version=(current.version if current is not None else 0) + 1,
+            car_revision=car_revision,
+            df_mobil=df_mobil,
+            df_motor=df_motor,
+            car_index=build_lookup_index(df_mobil, CAR_SCHEMA.key_cols, CAR_SCHEMA.year_col),
+            motor_index=motor_index,
+            car_fuzzy=FuzzyVehicleIndex(df_mobil, CAR_SCHEMA),
+            motor_fuzzy=motor_fuzzy,
+            car_prices=self._price_matrix(df_mobil, CAR_SCHEMA),
+            motor_prices=motor_prices,
+            car_depreciation=DepreciationModel.fit(df_mobil, CAR_SCHEMA),
+            motor_depreciation=motor_depreciation,
+        )
+
+    def _grade_factors_for(self, schema):
+        return self.grade_factors.get(schema.name, resolve_grade_factors())
+
+    def _price_matrix(self, df, schema):
+        base = df[schema.price_col] if schema.price_col in df.columns else pd.Series(dtype=float)
+        return GradePriceMatrix.build(base, self._grade_factors_for(schema))
+
+# --- Estimasi Batch (Lot Lelang) ---
+# Nama kolom di file lot yang boleh dipakai selain nama kolom dataset
+LOT_COLUMN_ALIASES = {
+    "mobil": {"brand": "name", "merek": "name", "year": "tahun"},
+    "mtr": {"merek": "brand", "varian": "variant", "tahun": "year"},
+}
+
+def read_lot_file(uploaded_file):
+    """Membaca file lot (CSV/XLSX) yang diunggah pengguna."""
+    if uploaded_file.name.lower().endswith((".xlsx", ".xls")):
+        return pd.read_excel(uploaded_file)
+    return pd.read_csv(uploaded_file, encoding='utf-8-sig')
+
+def _normalize_key(series):
+    return series.astype("string").str.strip().str.lower()
+
+@METRICS.timed("price_lot")
+def price_lot(df_lot, df_ref, schema, fuzzy_index=None, price_matrix=None, depreciation=None):
+    """
+    Menghitung harga seluruh baris lot sekaligus dengan satu join vektor ke dataset
+    referensi, lalu membaca harga per grade dari matriks harga (dibangun dari faktor
+    default bila price_matrix tidak diberikan). Bila depreciation diberikan, baris yang
+    variannya ada tetapi tahunnya tidak diberi harga dari model depresiasi dengan status
+    'dimodelkan'. Baris yang tetap tidak cocok dikembalikan dengan status 'tidak ditemukan'
+    dan, bila fuzzy_index diberikan, saran kendaraan terdekat beserta skor kemiripannya.
+    """
+    lot = df_lot.copy()
+    lot.columns = lot.columns.str.strip().str.lower()
+    lot = lot.rename(columns=LOT_COLUMN_ALIASES.get(schema.name, {}))
+    join_cols = [*schema.key_cols, schema.year_col]
+    missing = [col for col in join_cols if col not in lot.columns]
+    if missing:
+        raise ValueError(f"Kolom wajib tidak ada di file lot: {', '.join(missing)}")
+
+    # Kunci join dinormalisasi (huruf kecil, tanpa spasi tepi) di kedua sisi
+    left = pd.DataFrame({f"_{col}": _normalize_key(lot[col]) for col in schema.key_cols})
+    left[f"_{schema.year_col}"] = pd.to_numeric(lot[schema.year_col], errors='coerce').astype("Int64")
+    right = pd.DataFrame({f"_{col}": _normalize_key(df_ref[col]) for col in schema.key_cols})
+    right[f"_{schema.year_col}"] = df_ref[schema.year_col].astype("Int64")
+    right["_row"] = np.arange(len(df_ref), dtype=np.int64)
+    right["harga_awal"] = df_ref[schema.price_col].to_numpy()
+    if MARKET_AVG_COL in df_ref.columns:
+        right["rata_rata_pasar"] = df_ref[MARKET_AVG_COL].to_numpy()
+    key_names = [f"_{col}" for col in join_cols]
+    right = right.drop_duplicates(subset=key_names, keep='first')
+
+    merged = left.merge(right, on=key_names, how='left')
+    lot["harga_awal"] = merged["harga_awal"].to_numpy()
+    if "rata_rata_pasar" in merged.columns:
+        lot["rata_rata_pasar"] = merged["rata_rata_pasar"].to_numpy()
+
+    if "grade" in lot.columns:
+        grade_letters = lot["grade"].astype("string").str.strip().str[:1].str.upper().fillna("")
+        # Grade kosong (NA, string kosong, atau spasi saja) dianggap A
+        grade_letters = grade_letters.mask(grade_letters == "", "A")
+    else:
+        grade_letters = pd.Series("A", index=lot.index, dtype="string")
+    lot["grade"] = grade_letters
+    if price_matrix is None:
+        price_matrix = GradePriceMatrix.build(df_ref[schema.price_col], resolve_grade_factors())
+    rows = merged["_row"].fillna(-1).to_numpy(dtype=np.int64)
+    final_prices, factors = price_matrix.lookup(rows, grade_letters)
+    lot["faktor_grade"] = factors
+    lot["harga_akhir"] = final_prices
+
+    lot["dimodelkan"] = False
+    if depreciation is not None and lot["harga_awal"].isna().any():
+        # Keluarga varian dicocokkan dengan kunci ternormalisasi yang sama seperti join di atas
+        family_cols = [f"_{col}" for col in schema.key_cols]
+        families = pd.DataFrame(list(depreciation.family_ids), columns=family_cols).apply(_normalize_key)
+        families["_family"] = np.fromiter(depreciation.family_ids.values(), dtype=np.int64, count=len(families))
+        families = families.drop_duplicates(subset=family_cols, keep='first')
+        family_ids = left[family_cols].merge(families, on=family_cols, how='left')["_family"]
+        unmatched = lot["harga_awal"].isna().to_numpy()
+        family_ids = np.where(unmatched, family_ids.fillna(-1).to_numpy(dtype=np.int64), -1)
+        years = left[f"_{schema.year_col}"].to_numpy(dtype=np.float64, na_value=np.nan)
+        modeled_prices, _ = depreciation.predict(family_ids, years)
+        modeled = unmatched & np.isfinite(modeled_prices)
+        lot.loc[modeled, "harga_awal"] = modeled_prices[modeled]
+        lot.loc[modeled, "harga_akhir"] = modeled_prices[modeled] * factors[modeled]
+        lot["dimodelkan"] = modeled
+
+    matched = lot["harga_awal"].notna()
+    lot["status"] = np.where(
+        ~matched, "tidak ditemukan",
+        np.where(lot["faktor_grade"].isna(), "grade tidak valid", np.where(lot["dimodelkan"], "dimodelkan", "cocok"))
+    )
+
+    if fuzzy_index is not None and not matched.all():
+        unmatched = lot[~matched]
+        queries = unmatched[list(schema.key_cols)].astype("string").fillna("").agg(" ".join, axis=1)
+        years = pd.to_numeric(unmatched[schema.year_col], errors='coerce')
+        suggestions = fuzzy_index.search_many(queries.tolist(), [None if pd.isna(y) else int(y) for y in years])
+        lot["saran_terdekat"] = pd.Series(pd.NA, index=lot.index, dtype="string")
+        lot["skor_kemiripan"] = np.nan
+        lot.loc[~matched, "saran_terdekat"] = [
+            " ".join(str(c[col]) for col in (*schema.key_cols, schema.year_col)) if c else pd.NA
+            for c in (found[0] if found else None for found in suggestions)
+        ]
+        lot.loc[~matched, "skor_kemiripan"] = [found[0]["score"] if found else np.nan for found in suggestions]
+    return lot
+
+
+# --- Fungsi-fungsi untuk Non-Automotif ---
+def build_common_query(keywords, time_filter, use_condition_filter, use_url_filter):
+    """Membangun query fleksibel untuk BARANG UMUM."""
+    query_parts = [f'jual {keywords}']
+    if use_condition_filter:
+        query_parts.append("(inurl:bekas OR inurl:second OR inurl:seken OR inurl:seperti-baru OR inurl:2nd OR inurl:like-new) -BNIB -segel")
+    if use_url_filter:
+        query_parts.append("(site:tokopedia.com OR site:shopee.co.id)")
+    query = " ".join(query_parts)
+    params = {"q": query.strip(), "engine": "google", "gl": "id", "hl": "id", "location": "Jakarta, Jakarta, Indonesia"}
+    if time_filter != "Semua Waktu":
+        params["tbs"] = time_filter
+    return params
+
+def build_spare_part_query(keywords, time_filter, use_condition_filter, use_url_filter):
+    """Membangun query optimal untuk kategori SPARE PART."""
+    query_parts = [f'jual {keywords}']
+    if use_condition_filter:
+        query_parts.append("(inurl:bekas OR inurl:second OR inurl:seken OR inurl:seperti-baru OR inurl:2nd OR inurl:copotan OR inurl:like-new) -BNIB -segel")
+    if use_url_filter:
+        query_parts.append("(site:tokopedia.com OR site:shopee.co.id OR site:monotaro.id OR site:olx.co.id)")
+    query = " ".join(query_parts)
+    params = {"q": query.strip(), "engine": "google", "gl": "id", "hl": "id"}
+    if time_filter != "Semua Waktu":
+        params["tbs"] = time_filter
+    return params
+
+def build_heavy_equipment_query(alat_type, brand, model, year, time_filter, use_condition_filter, use_url_filter):
+    """Membangun query optimal untuk kategori ALAT BERAT."""
+    search_keywords = f'jual {alat_type} {brand} {model} tahun {year}'
+    query_parts = [search_keywords]
+    if use_condition_filter:
+        query_parts.append("(bekas|second) -sewa -rental -disewakan")
+    if use_url_filter:
+        query_parts.append("(site:olx.co.id OR site:indotrading.com OR site:alatberat.com OR site:jualo.com)")
+    query = " ".join(query_parts)
+    params = {"q": query.strip(), "engine": "google", "gl": "id", "hl": "id"}
+    if time_filter != "Semua Waktu":
+        params["tbs"] = time_filter
+    return params
+
+def build_scrap_query(scrap_type, unit, time_filter):
+    """Membangun query optimal untuk kategori SCRAP."""
+    search_keywords = f'harga {scrap_type} bekas {unit}'
+    params = {"q": search_keywords.strip(), "engine": "google", "gl": "id", "hl": "id"}
+    if time_filter != "Semua Waktu":
+        params["tbs"] = time_filter
+    return params
+
+# Umur cache hasil SerpAPI mengikuti filter waktu: jendela pendek cepat basi
+SERPAPI_CACHE_TTLS = {"qdr:w": 6 * 3600, "qdr:m": 24 * 3600, "qdr:y": 3 * 24 * 3600}
+SERPAPI_DEFAULT_CACHE_TTL = 24 * 3600
+
+def make_serpapi_cache_key(params):
+    """Kunci kanonik dari parameter pencarian tanpa api_key; query dirapikan (huruf kecil, spasi tunggal)."""
+    canonical = {key: str(value) for key, value in params.items() if key != "api_key"}
+    if "q" in canonical:
+        canonical["q"] = " ".join(canonical["q"].lower().split())
+    return make_cache_key("serpapi", canonical)
+
+def search_with_serpapi(params, api_key, session=None, cache=None):
+    """
+    Melakukan pencarian menggunakan SerpAPI. Aman dipanggil dari thread pekerja:
+    params tidak diubah dan error dilempar ke pemanggil, bukan ditampilkan di UI.
+    Jika cache diberikan, hasil yang identik diambil dari cache tanpa memakai kuota API.
+    """
+    cache_key = make_serpapi_cache_key(params) if cache is not None else None
+    if cache_key is not None:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    session = session or get_http_session("serpapi")
+    with METRICS.track("serpapi"):
+        response = session.get(SERPAPI_SEARCH_URL, params={**params, "api_key": api_key}, timeout=20)
+        response.raise_for_status()
+        data = response.json()
+    if cache is not None:
+        store_serpapi_result(cache, params, data)
+    return data
+
+def store_serpapi_result(cache, params, data):
+    """Menyimpan respons SerpAPI ke cache dengan TTL sesuai filter waktu; respons error tidak disimpan."""
+    if "error" not in data:
+        cache.set(make_serpapi_cache_key(params), data, ttl=SERPAPI_CACHE_TTLS.get(params.get("tbs"), SERPAPI_DEFAULT_CACHE_TTL))
+
+def build_query_variants(category, time_filter, use_condition_filter, use_url_filter, **inputs):
+    """
+    Menyusun satu atau beberapa varian query untuk kategori yang dipilih. Jika filter
+    kondisi aktif, varian tanpa filter kondisi ikut dijalankan paralel untuk memperluas
+    bukti harga; hasil varian utama tetap didahulukan saat digabung.
+    """
+    def build(condition_filter):
+        if category == "Umum":
+            return build_common_query(inputs["keywords"], time_filter, condition_filter, use_url_filter)
+        if category == "Spare Part":
+            return build_spare_part_query(inputs["keywords"], time_filter, condition_filter, use_url_filter)
+        if category == "Alat Berat":
+            return build_heavy_equipment_query(inputs["alat_type"], inputs["brand"], inputs["model"], inputs["year"], time_filter, condition_filter, use_url_filter)
+        return build_scrap_query(inputs["scrap_type"], inputs["unit"], time_filter)
+
+    variants = [build(use_condition_filter)]
+    if category != "Scrap" and use_condition_filter:
+        variants.append(build(False))
+    return variants
+
+# --- Pemanenan Multi-Halaman SerpAPI ---
+SERPAPI_PAGE_SIZE = 10
+SERPAPI_RATE_PER_SECOND = 5
+
+class RateBudget:
+    """Token bucket per API key: membatasi laju panggilan tanpa menolak permintaan (menunggu giliran)."""
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+def _result_fingerprint(result):
+    """Hash URL hasil pencarian (tanpa fragmen/garis miring akhir), atau judulnya jika URL kosong."""
+    link = (result.get('link') or '').split('#')[0].rstrip('/').lower()
+    basis = link or normalize_vehicle_text(result.get('title', ''))
+    return hashlib.md5(basis.encode("utf-8")).hexdigest()
+
+class SerpApiHarvester:
+    """
+    Mengambil beberapa halaman (offset start) untuk beberapa varian query secara paralel
+    lewat pool thread terbatas. Halaman diambil per gelombang: gelombang berikutnya hanya
+    dijalankan jika cuplikan yang memuat harga belum mencapai target, dan varian yang
+    hasilnya sudah habis tidak dilanjutkan. Hasil diduplikasi berdasarkan hash URL/judul.
+    """
+    def __init__(self, executor, session, api_key, rate_budget, cache=None, max_pages=3, target_price_snippets=15):
+        self.executor = executor
+        self.session = session
+        self.api_key = api_key
+        self.rate_budget = rate_budget
+        self.cache = cache
+        self.max_pages = max_pages
+        self.target_price_snippets = target_price_snippets
+        self.pages_done = 0
+        self.pages_planned = 0
+        self.errors = []
+        self._progress_lock = threading.Lock()
+
+    def _fetch(self, params, page):
+        page_params = {**params, "start": page * SERPAPI_PAGE_SIZE} if page else params
+        try:
+            if self.cache is not None:
+                cached = self.cache.get(make_serpapi_cache_key(page_params))
+                if cached is not None:
+                    return cached
+            # Anggaran laju hanya dipotong untuk panggilan yang benar-benar ke API. Cache sudah
+            # diperiksa di atas, jadi tidak diteruskan agar miss tidak tercatat dua kali.
+            self.rate_budget.acquire()
+            data = search_with_serpapi(page_params, self.api_key, self.session)
+            if self.cache is not None:
+                store_serpapi_result(self.cache, page_params, data)
+            return data
+        finally:
+            with self._progress_lock:
+                self.pages_done += 1
+
+    @METRICS.timed("serpapi_harvest")
+    def harvest(self, param_variants):
+        """Mengembalikan data gabungan berformat respons SerpAPI, atau None jika semua panggilan gagal."""
+        merged = {"organic_results": [], "related_questions": []}
+        seen_results, seen_questions = set(), set()
+        price_snippets = 0
+        fetched_any = False
+        active = list(param_variants)
+        self.pages_planned = len(active) * self.max_pages
+
+        for page in range(self.max_pages):
+            futures = [(params, submit_with_context(self.executor, self._fetch, params, page)) for params in active]
+            next_active = []
+            # Diproses sesuai urutan varian agar hasil varian utama tetap di depan
+            for params, future in futures:
+                try:
+                    data = future.result()
+                except Exception as e:
+                    self.errors.append(e)
+                    continue
+                fetched_any = True
+                organic = data.get('organic_results', [])
+                for result in organic:
+                    fingerprint = _result_fingerprint(result)
+                    if fingerprint in seen_results:
+                        continue
+                    seen_results.add(fingerprint)
+                    merged["organic_results"].append(result)
+                    if extract_prices_from_text(f"{result.get('title', '')} {result.get('snippet', '')}"):
+                        price_snippets += 1
+                for question in data.get('related_questions', []):
+                    if question.get('question') not in seen_questions:
+                        seen_questions.add(question.get('question'))
+                        merged["related_questions"].append(question)
+                if len(organic) >= SERPAPI_PAGE_SIZE and data.get('serpapi_pagination', {}).get('next'):
+                    next_active.append(params)
+
+            active = next_active
+            if price_snippets >= self.target_price_snippets or not active:
+                break
+
+        self.pages_planned = self.pages_done
+        return merged if fetched_any else None
+
+class SearchJob:
+    """
+    Satu pekerjaan pencarian non-otomotif yang berjalan di latar belakang. Skrip hanya
+    memantau kemajuannya; job disimpan di session state sehingga bila skrip di-rerun di
+    tengah jalan, hasilnya tetap bisa diambil pada rerun berikutnya.
+    """
+    def __init__(self, job_executor, harvester, param_variants, **context):
+        self.context = context
+        self.harvester = harvester
+        self.started_at = time.monotonic()
+        self.future = submit_with_context(job_executor, harvester.harvest, param_variants)
+
+    @property
+    def done(self):
+        return self.future.done()
+
+    @property
+    def progress(self):
+        return min(1.0, self.harvester.pages_done / max(1, self.harvester.pages_planned))
+
+    def result(self):
+        """Mengembalikan (data gabungan, daftar error)."""
+        try:
+            return self.future.result(), list(self.harvester.errors)
+        except Exception as e:
+            return None, [*self.harvester.errors, e]
+
+# --- Mesin Filter Teks & Ekstraksi Harga (Regex Terkompilasi) ---
+NEGATIVE_KEYWORDS = ('baru', 'bnib', 'resmi', 'official', 'store', 'casing', 'charger', 'aksesoris', 'sewa', 'rental')
+_NEGATIVE_PATTERN = re.compile("|".join(map(re.escape, NEGATIVE_KEYWORDS)))
+
+# Harga wajib diawali "Rp" atau diakhiri satuan (jt/juta/rb/ribu/k/miliar/M) agar angka
+# seperti "iPhone 14" atau "256GB" tidak ikut terbaca sebagai harga. Tanpa "Rp", satuan
+# ambigu hanya diterima untuk angka tertentu: "k" setelah angka 1-2 digit ("4K UHD", "8k",
+# "16k") adalah istilah resolusi, dan "M" (miliar, hanya huruf besar karena "m" kecil
+# lazimnya meter) harus berdesimal seperti "1,5 M" agar kode model ("PC200-8 M") tidak terbaca.
+_AMBIGUOUS_UNIT_NUMBERS = {'k': re.compile(r'^\d{1,2}$'), 'm': re.compile(r'^\d+$')}
+_PRICE_PATTERN = re.compile(
+    r'(?<![\w.,])(?P<rp>rp\.?\s*)?'
+    r'(?P<num>\d{1,3}(?:[.,]\d{3})+(?:,\d{1,2})?|\d+(?:[.,]\d+)?)'
+    r'\s*(?P<unit>juta|jt|ribu|rb|miliar|milyar|k|(?-i:M))?(?![a-z])',
+    re.IGNORECASE
+)
+_PRICE_UNITS = {'juta': 1e6, 'jt': 1e6, 'ribu': 1e3, 'rb': 1e3, 'k': 1e3, 'miliar': 1e9, 'milyar': 1e9, 'm': 1e9}
+_THOUSANDS_GROUPED = re.compile(r'^\d{1,3}(?:([.,])\d{3})(?:\1\d{3})*(?:,\d{1,2})?$')
+
+def _parse_price_number(num):
+    """Menafsirkan '1.500.000', '1.500.000,00', '1,5' (dengan satuan), atau '12.5'."""
+    grouped = _THOUSANDS_GROUPED.match(num)
+    if grouped:
+        separator = grouped.group(1)
+        integer, _, _ = num.partition(',') if separator == '.' else (num, '', '')
+        return float(integer.replace(separator, ''))
+    return float(num.replace(',', '.'))
+
+def extract_prices_from_text(text):
+    """Mengekstrak harga (Rupiah) dari teks, termasuk bentuk 'Rp 1,5 jt', '12 juta', '500rb', dan '1,5 M'."""
+    prices = []
+    for match in _PRICE_PATTERN.finditer(text):
+        unit = (match.group('unit') or '').lower()
+        if not match.group('rp'):
+            ambiguous = _AMBIGUOUS_UNIT_NUMBERS.get(unit)
+            if not unit or (ambiguous is not None and ambiguous.match(match.group('num'))):
+                continue
+        try:
+            price = _parse_price_number(match.group('num')) * _PRICE_UNITS.get(unit, 1)
+        except ValueError:
+            continue
+        if price > 1000:
+            prices.append(price)
+    return prices
+
+@functools.lru_cache(maxsize=256)
+def _keyword_pattern(keywords):
+    return re.compile("|".join(map(re.escape, keywords))) if keywords else None
+
+def extract_listing_records(serpapi_data, product_name):
+    """
+    Menyaring hasil pencarian dalam satu lintasan dan mengembalikan record terstruktur
+    (jenis, judul, cuplikan, url, harga, kata kunci yang cocok). Hasil organik dibuang
+    bila memuat kata kunci negatif atau tidak memuat satu pun kata kunci produk;
+    related_questions selalu disertakan sebagai konteks tambahan.
+    """
+    main_keywords = tuple(sorted({word.lower() for word in product_name.split() if len(word) > 2}))
+    main_pattern = _keyword_pattern(main_keywords)
+    records = []
+
+    for result in serpapi_data.get('organic_results', []):
+        title = result.get('title', '')
+        snippet = result.get('snippet', '')
+        full_text = f"{title} {snippet}".lower()
+
+        if _NEGATIVE_PATTERN.search(full_text):
+            continue
+        matched = set(main_pattern.findall(full_text)) if main_pattern else set()
+        if not matched:
+            continue
+        records.append({
+            "kind": "organic", "title": title, "snippet": snippet, "url": result.get('link', ''),
+            "prices": extract_prices_from_text(full_text), "matched_keywords": sorted(matched),
+        })
+
+    for question in serpapi_data.get('related_questions', []):
+        title = question.get('question', '')
+        snippet = question.get('snippet', '')
+        records.append({
+            "kind": "question", "title": title, "snippet": snippet, "url": question.get('link', ''),
+            "prices": extract_prices_from_text(f"{title} {snippet}"), "matched_keywords": [],
+        })
+    return records
+
+# --- Penyusun Konteks LLM Berbasis Anggaran Token ---
+DEFAULT_CONTEXT_TOKEN_BUDGET = 3000
+
+# Anggaran token konteks per awalan nama model OpenRouter; model lain memakai default
+MODEL_CONTEXT_TOKEN_BUDGETS = {
+    "openai/gpt-4o-mini": 4000,
+    "google/gemini": 6000,
+    "anthropic/": 4000,
+    "meta-llama/": 3000,
+}
+
+_TOKEN_PIECE_PATTERN = re.compile(r"\w+|[^\w\s]")
+_NEAR_DUPLICATE_THRESHOLD = 0.8
+
+def estimate_tokens(text):
+    """Perkiraan token lokal ala BPE: tiap kata ~4 karakter per token, tiap tanda baca 1 token."""
+    return sum((len(piece) + 3) // 4 for piece in _TOKEN_PIECE_PATTERN.findall(text))
+
+def context_budget_for_model(model_name):
+    """Anggaran token konteks untuk model tertentu."""
+    for prefix, budget in MODEL_CONTEXT_TOKEN_BUDGETS.items():
+        if model_name.startswith(prefix):
+            return budget
+    return DEFAULT_CONTEXT_TOKEN_BUDGET
+
+def _word_shingles(text):
+    words = normalize_vehicle_text(text).split()
+    return {" ".join(words[i:i + 3]) for i in range(max(1, len(words) - 2))}
+
+def build_llm_context(records, token_budget=DEFAULT_CONTEXT_TOKEN_BUDGET):
+    """
+    Menyusun konteks LLM dari record pencarian di bawah anggaran token. Record diberi
+    skor (memuat harga, kecocokan kata kunci, hasil organik lebih dulu dari pertanyaan),
+    yang hampir identik (Jaccard shingle 3 kata >= 0,8) dibuang, lalu dimasukkan
+    berurutan selama muat. Mengembalikan (teks konteks, statistik penyusunan).
+    """
+    max_keywords = max((len(record["matched_keywords"]) for record in records), default=0) or 1
+
+    def score(record):
+        return (
+            (2.0 if record["prices"] else 0.0)
+            + len(record["matched_keywords"]) / max_keywords
+            + (0.5 if record["kind"] == "organic" else 0.0)
+        )
+
+    ranked = sorted(records, key=score, reverse=True)  # sort stabil: urutan hasil pencarian tetap dihormati
+    selected_shingles = []
+    lines = []
+    stats = {"records": len(records), "selected": 0, "duplicates": 0, "over_budget": 0, "tokens": 0}
+    for record in ranked:
+        text = " ".join(filter(None, (record["title"], record["snippet"])))
+        if not text:
+            continue
+        shingles = _word_shingles(text)
+        if any(len(shingles & other) / len(shingles | other) >= _NEAR_DUPLICATE_THRESHOLD for other in selected_shingles):
+            stats["duplicates"] += 1
+            continue
+        line = f"- {record['title']}: {record['snippet']}" if record["snippet"] else f"- {record['title']}"
+        tokens = estimate_tokens(line) + 1
+        if stats["tokens"] + tokens > token_budget:
+            stats["over_budget"] += 1
+            continue
+        lines.append(line)
+        selected_shingles.append(shingles)
+        stats["tokens"] += tokens
+        stats["selected"] += 1
+    return "\n".join(lines), stats
+
+# --- Estimator Harga Statistik (Sebelum LLM) ---
+MIN_STRONG_EVIDENCE = 5
+MAX_STRONG_DISPERSION = 0.25
+
+@dataclass(frozen=True)
+class PriceEstimate:
+    """Hasil estimasi statistik dari harga-harga yang ditemukan di hasil pencarian."""
+    median: float
+    low: float
+    high: float
+    sample_size: int
+    outliers_removed: int
+    dispersion: float
+    strong: bool
+    grade_prices: dict
+
+def estimate_price_from_evidence(prices, min_strong=MIN_STRONG_EVIDENCE, max_dispersion=MAX_STRONG_DISPERSION):
+    """
+    Estimator harga yang tahan outlier: buang pencilan dengan pagar IQR lalu MAD (3σ),
+    ambil median beserta pita kepercayaan 95% (galat baku median ≈ 1,253·σ/√n), dan
+    turunkan harga per grade dari GRADE_FACTORS. Bukti dianggap kuat bila jumlah
+    sampel cukup dan sebaran relatif (MAD/median) kecil. None jika tidak ada harga.
+    """
+    values = np.asarray(prices, dtype=np.float64)
+    values = values[np.isfinite(values) & (values > 0)]
+    if values.size == 0:
+        return None
+
+    q1, q3 = np.percentile(values, [25, 75])
+    iqr = q3 - q1
+    trimmed = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+    median = float(np.median(trimmed))
+    sigma = 1.4826 * float(np.median(np.abs(trimmed - median)))
+    if sigma > 0:
+        trimmed = trimmed[np.abs(trimmed - median) <= 3 * sigma]
+        median = float(np.median(trimmed))
+        sigma = 1.4826 * float(np.median(np.abs(trimmed - median)))
+
+    half_width = 1.96 * 1.253 * sigma / np.sqrt(trimmed.size)
+    dispersion = sigma / median if median else float("inf")
+    return PriceEstimate(
+        median=median,
+        low=max(float(trimmed.min()), median - half_width),
+        high=min(float(trimmed.max()), median + half_width),
+        sample_size=int(trimmed.size),
+        outliers_removed=int(values.size - trimmed.size),
+        dispersion=dispersion,
+        strong=trimmed.size >= min_strong and dispersion <= max_dispersion,
+        grade_prices={letter: median * factor for letter, factor in GRADE_LETTER_FACTORS.items()},
+    )
+
+def build_non_auto_prompt(context_text, product_name, grade):
+    """Menyusun prompt analisis harga barang non-otomotif."""
+    return f"""
+    Anda adalah asisten ahli analisis harga barang bekas yang bekerja di balai lelang digital LEGOAS.
+    Tugas Anda adalah menganalisis KONTEKS PENCARIAN untuk menemukan harga pasaran wajar.
+
+    PRODUK YANG DICARI: "{product_name}"
+    GRADE KONDISI: "{grade}"
+
+    KONTEKS PENCARIAN:
+    ---
+    {context_text}
+    ---
+
+    INSTRUKSI UTAMA:
+    1.  Fokus utama Anda adalah pada PRODUK YANG DICARI. Abaikan harga untuk produk atau aksesoris lain.
+    2.  Berdasarkan data, berikan analisis singkat mengenai kondisi pasar dan variasi harga yang Anda temukan.
+    3.  Berikan satu **rekomendasi harga jual wajar** untuk produk tersebut dalam kondisi bekas layak pakai (ini kita sebut sebagai "Harga Grade A"). Jelaskan alasan di balik angka ini.
+    4.  Jika harga barang yang ditemukan bukan harga barang bekas, maka kalikan harga barang baru yang ditemukan dengan 85%.
+    5.  Setelah menentukan Harga Grade A, hitung dan tampilkan harga untuk grade lainnya berdasarkan persentase berikut:
+        -   **Harga Grade A (Kondisi Sangat Baik):** Tampilkan harga rekomendasi Anda.
+        -   **Harga Grade B (Kondisi Baik):** Hitung 94% dari Harga Grade A.
+        -   **Harga Grade C (Kondisi Cukup):** Hitung 80% dari Harga Grade A.
+        -   **Harga Grade D (Kondisi Kurang):** Hitung 58% dari Harga Grade A.
+        -   **Harga Grade E (Kondisi Apa Adanya):** Hitung 23% dari Harga Grade A.
+    6.  Sajikan hasil akhir dalam format yang jelas, dimulai dengan analisis pasar, lalu diikuti oleh daftar harga berdasarkan grade. Beri penekanan (misalnya dengan bold) pada harga yang sesuai dengan **GRADE KONDISI** yang diminta pengguna.
+    7.  JAWABAN HARUS DALAM BENTUK TEKS BIASA, BUKAN JSON.
+    """
+
+def stream_llm_non_auto(context_text, product_name, api_key, grade, llm_model):
+    """
+    Mengirim teks yang sudah diproses ke OpenRouter. Mengembalikan LLMStream yang
+    mengalirkan analisisnya per potongan teks; periksa ok/error setelah aliran habis.
+    """
+    messages = [{"role": "user", "content": build_non_auto_prompt(context_text, product_name, grade)}]
+    return LLMStream(stream_openrouter(messages, api_key, llm_model, max_tokens=1200, temperature=0.2))
+
+# --- Layanan Harga Headless (Dipakai Bersama UI & API) ---
+VEHICLE_SCHEMAS = {"mobil": CAR_SCHEMA, "motor": MOTOR_SCHEMA}
+
+def _json_number(value):
+    """Angka siap-JSON: NaN/inf/None menjadi None, tipe NumPy menjadi float/int Python."""
+    if value is None or pd.isna(value) or not np.isfinite(value):
+        return None
+    return int(value) if isinstance(value, (int, np.integer)) else float(value)
+
+MIN_VEHICLE_YEAR = 1950
+
+def parse_vehicle_year(value):
+    """
+    Tahun kendaraan dari masukan API: bilangan bulat 4 digit (atau string/float yang
+    setara) antara MIN_VEHICLE_YEAR dan tahun depan. Selain itu ValueError berpesan rapi.
+    """
+    max_year = pd.Timestamp.now().year + 1
+    year = None
+    if isinstance(value, (int, np.integer)) and not isinstance(value, bool):
+        year = int(value)
+    elif isinstance(value, float) and value.is_integer():
+        year = int(value)
+    elif isinstance(value, str) and re.fullmatch(r'\d{4}', value.strip()):
+        year = int(value)
+    if year is None or not MIN_VEHICLE_YEAR <= year <= max_year:
+        raise ValueError(f"Tahun harus berupa angka 4 digit antara {MIN_VEHICLE_YEAR} dan {max_year}")
+    return year
+
+def parse_grade(value, default="A"):
+    """
+    Huruf grade dari masukan API: huruf tunggal atau label lengkap ('B (Baik)'), tanpa
+    peduli huruf besar/kecil dan spasi tepi. Kosong memakai default; huruf di luar
+    GRADE_LETTERS (kunci faktor grade) menghasilkan ValueError.
+    """
+    text = "" if value is None else str(value).strip()
+    if not text:
+        return default
+    labels = {label.upper(): letter for label, letter in zip(GRADE_FACTORS, GRADE_LETTERS)}
+    letter = text.upper() if len(text) == 1 else labels.get(text.upper())
+    if letter not in GRADE_LETTERS:
+        raise ValueError(f"Grade harus salah satu dari {', '.join(GRADE_LETTERS)}")
+    return letter
+
+def snapshot_tables(snapshot, kind):
+    """(DataFrame, indeks bertingkat, indeks fuzzy, matriks harga, model depresiasi) untuk 'mobil' atau 'motor'."""
+    if kind == "mobil":
+        return snapshot.df_mobil, snapshot.car_index, snapshot.car_fuzzy, snapshot.car_prices, snapshot.car_depreciation
+    if kind == "motor":
+        return snapshot.df_motor, snapshot.motor_index, snapshot.motor_fuzzy, snapshot.motor_prices, snapshot.motor_depreciation
+    raise ValueError(f"Jenis kendaraan tidak dikenal: {kind}")
+
+@METRICS.timed("quote_vehicle")
+def quote_vehicle(snapshot, kind, identity, grade="A"):
+    """
+    Estimasi harga satu kendaraan dari snapshot aktif. identity memuat kolom kunci
+    skema beserta tahun (misal name/model/varian/tahun untuk mobil). Mengembalikan
+    dict siap-JSON. Bila varian ada tetapi tahunnya tidak, harga diambil dari model
+    depresiasi dengan modeled=True; bila varian pun tidak ada, found=False dengan saran terdekat.
+    """
+    schema = VEHICLE_SCHEMAS[kind]
+    df, index, fuzzy, prices, depreciation = snapshot_tables(snapshot, kind)
+    missing = [col for col in (*schema.key_cols, schema.year_col) if identity.get(col) in (None, "")]
+    if missing:
+        raise ValueError(f"Field wajib kosong: {', '.join(missing)}")
+    grade_letter = parse_grade(grade)
+    year = parse_vehicle_year(identity[schema.year_col])
+    keys = [str(identity[col]).strip() for col in schema.key_cols]
+    keys = resolve_index_keys(index, *keys) or keys
+
+    result = {"kind": kind, "dataset_version": snapshot.version, "grade": grade_letter}
+    row = lookup_row_position(index, *keys, year)
+    modeled = depreciation.price(keys, year) if row is None else None
+    if modeled is not None:
+        base_price, _ = modeled
+        factor = prices.factor(grade_letter)
+        result.update(
+            found=True, modeled=True,
+            identity={**dict(zip(schema.key_cols, keys)), schema.year_col: year},
+            harga_awal=_json_number(base_price),
+            faktor_grade=_json_number(factor),
+            harga_akhir=_json_number(base_price * factor),
+        )
+        return result
+    if row is None:
+        suggestions = fuzzy.search(" ".join(keys), year=year, limit=3)
+        result.update(found=False, suggestions=[
+            {**{col: str(c[col]) for col in schema.key_cols}, schema.year_col: int(c[schema.year_col]), "score": c["score"]}
+            for c in suggestions
+        ])
+        return result
+
+    record = df.iloc[row]
+    result.update(
+        found=True, modeled=False,
+        identity={**{col: str(record[col]) for col in schema.key_cols}, schema.year_col: int(record[schema.year_col])},
+        harga_awal=_json_number(prices.base[row]),
+        faktor_grade=_json_number(prices.factors[GRADE_LETTERS.index(grade_letter)]),
+        harga_akhir=_json_number(prices.price(row, grade_letter)),
+    )
+    if MARKET_AVG_COL in df.columns:
+        result["rata_rata_pasar"] = _json_number(record[MARKET_AVG_COL])
+    return result
+
+@METRICS.timed("summarize_evidence")
+def summarize_search_evidence(serpapi_data, product_name, token_budget=DEFAULT_CONTEXT_TOKEN_BUDGET):
+    """
+    Mengolah data SerpAPI gabungan menjadi bukti harga: record listing bersih, konteks
+    LLM di bawah anggaran token beserta statistiknya, dan estimasi statistik (bisa None).
+    """
+    listing_records = extract_listing_records(serpapi_data, product_name)
+    context_text, context_stats = build_llm_context(listing_records, token_budget)
+    estimate = estimate_price_from_evidence([price for record in listing_records for price in record["prices"]])
+    return listing_records, context_text, context_stats, estimate
+
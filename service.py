@@ -0,0 +1,308 @@
+# ==============================================================================
+# LAYANAN HARGA HEADLESS (HTTP/JSON, ASGI)
+# Jalankan: uvicorn service:app --host 0.0.0.0 --port 8000 --workers 4
+#
+# Konfigurasi dibaca dari file secrets yang sama dengan Streamlit
+# (.streamlit/secrets.toml, atau path di env LEGOAS_SECRETS). Tiap worker memuat
+# DatasetRegistry sendiri dari snapshot Feather dan cache SQLite di .cache/ yang
+# dipakai bersama aplikasi Streamlit, jadi worker baru tidak mengunduh ulang data.
+# Faktor [grade_factors] dibaca saat worker start: setelah diubah, restart worker
+# (aplikasi Streamlit membaca ulang faktor tersebut tanpa restart).
+# ==============================================================================
+
+import asyncio
+import dataclasses
+import hmac
+import json
+import logging
+import math
+import os
+import tomllib
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from pricing_core import (
+    CAR_SCHEMA, MOTOR_SCHEMA, VEHICLE_SCHEMAS, LOT_COLUMN_ALIASES, SERPAPI_DEFAULT_CACHE_TTL, SERPAPI_RATE_PER_SECOND,
+    METRICS, current_user, DatasetRegistry, RateBudget, SerpApiHarvester, TieredCache,
+    build_query_variants, context_budget_for_model, get_http_session, parse_grade, parse_vehicle_year, price_lot, quote_vehicle,
+    resolve_grade_factors, snapshot_tables, stream_llm_non_auto, summarize_search_evidence,
+)
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 5 * 1024 * 1024
+NON_AUTO_CATEGORIES = ("Umum", "Spare Part", "Alat Berat", "Scrap")
+
+class HTTPError(Exception):
+    """Error yang dikembalikan ke klien sebagai respons JSON dengan status tertentu."""
+    def __init__(self, status, message, /, **extra):
+        super().__init__(message)
+        self.status = status
+        self.body = {"error": message, **extra}
+
+def load_settings(path=None):
+    """Membaca secrets.toml milik Streamlit sebagai dict biasa."""
+    path = path or os.environ.get("LEGOAS_SECRETS", os.path.join(".streamlit", "secrets.toml"))
+    with open(path, "rb") as f:
+        return tomllib.load(f)
+
+def estimate_to_dict(estimate):
+    """PriceEstimate menjadi dict siap-JSON (None jika tidak ada bukti harga)."""
+    if estimate is None:
+        return None
+    payload = dataclasses.asdict(estimate)
+    if not math.isfinite(payload["dispersion"]):
+        payload["dispersion"] = None
+    return payload
+
+class PricingService:
+    """
+    Inti layanan: satu registry dataset, cache SerpAPI, dan pool thread per proses
+    worker. Handler tidak menyimpan state per klien, jadi aman dipanggil paralel.
+    """
+    def __init__(self, settings):
+        self.settings = settings
+        self.api_keys = tuple(settings.get("api", {}).get("keys", ()))
+        data_sources = settings.get("data_sources", {})
+        grade_overrides = settings.get("grade_factors", {})
+        self.registry = DatasetRegistry(
+            data_sources.get("mobil_data_id"),
+            data_sources.get("motor_path", "dt/mtr.csv"),
+            data_sources.get("avg_path", "dt/avg.csv"),
+            refresh_interval=data_sources.get("refresh_interval_seconds", 300),
+            grade_factors={
+                schema.name: resolve_grade_factors(grade_overrides.get(schema.name))
+                for schema in (CAR_SCHEMA, MOTOR_SCHEMA)
+            },
+            drive_credentials=settings.get("gcp_service_account"),
+        )
+        self.search_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="serpapi")
+        self.serpapi_cache = TieredCache("serpapi", max_entries=1024, default_ttl=SERPAPI_DEFAULT_CACHE_TTL)
+        self.rate_budget = RateBudget(SERPAPI_RATE_PER_SECOND, burst=SERPAPI_RATE_PER_SECOND)
+
+    def start(self):
+        """Memuat snapshot pertama lalu menjalankan refresher latar belakang."""
+        self.registry.ensure_loaded()
+        self.registry.start_background_refresh()
+
+    def authorize(self, headers):
+        """Memeriksa header Authorization: Bearer <key> atau X-API-Key terhadap [api] keys."""
+        supplied = headers.get("x-api-key") or headers.get("authorization", "").removeprefix("Bearer ").strip()
+        if not supplied or not any(hmac.compare_digest(supplied, key) for key in self.api_keys):
+            raise HTTPError(401, "API key tidak valid atau tidak ada.")
+
+    def snapshot(self):
+        snapshot = self.registry.snapshot
+        if snapshot is None:
+            raise HTTPError(503, "Dataset belum siap dimuat.")
+        return snapshot
+
+    def health(self):
+        """Status layanan: "ok", "loading" (belum ada snapshot), atau "degraded" (tabel kosong / error pemuatan terakhir)."""
+        snapshot = self.registry.snapshot
+        if snapshot is None:
+            status = "loading"
+        elif snapshot.df_mobil.empty or snapshot.df_motor.empty or self.registry.last_error is not None:
+            status = "degraded"
+        else:
+            status = "ok"
+        return {
+            "status": status,
+            "dataset_version": snapshot.version if snapshot is not None else None,
+            "rows": {
+                "mobil": len(snapshot.df_mobil) if snapshot is not None else 0,
+                "motor": len(snapshot.df_motor) if snapshot is not None else 0,
+            },
+            "last_error": str(self.registry.last_error) if self.registry.last_error else None,
+        }
+
+    def quote(self, kind, body):
+        """Estimasi satu kendaraan (modeled=True bila tahunnya dimodelkan); 404 beserta saran terdekat bila variannya tidak ada."""
+        aliases = LOT_COLUMN_ALIASES.get(VEHICLE_SCHEMAS[kind].name, {})
+        identity = {aliases.get(key.lower(), key.lower()): value for key, value in body.items()}
+        try:
+            result = quote_vehicle(self.snapshot(), kind, identity, body.get("grade", "A"))
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+        if not result["found"]:
+            raise HTTPError(404, "Kombinasi tidak ditemukan di dataset.", suggestions=result["suggestions"])
+        return result
+
+    def price_lot(self, kind, body):
+        """Estimasi batch: body {"rows": [...]} dengan kolom sama seperti file lot di UI."""
+        rows = body.get("rows")
+        if not isinstance(rows, list) or not rows or not all(isinstance(row, dict) for row in rows):
+            raise HTTPError(400, "Field 'rows' wajib berupa daftar objek baris lot.")
+        df_ref, _, fuzzy, prices, depreciation = snapshot_tables(self.snapshot(), kind)
+        try:
+            priced = price_lot(pd.DataFrame(rows), df_ref, VEHICLE_SCHEMAS[kind], fuzzy, prices, depreciation)
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+        # to_json mengubah NaN/NA menjadi null tanpa iterasi per sel di Python
+        return {"rows": json.loads(priced.to_json(orient="records", force_ascii=False))}
+
+    def analyze_non_auto(self, body):
+        """
+        Pencarian multi-halaman + estimasi statistik untuk barang non-otomotif. LLM hanya
+        dipanggil bila use_llm true, atau (bawaan) bila bukti harga statistik belum kuat.
+        """
+        category = body.get("category", "Umum")
+        if category not in NON_AUTO_CATEGORIES:
+            raise HTTPError(400, f"Kategori harus salah satu dari {', '.join(NON_AUTO_CATEGORIES)}")
+        inputs = body.get("inputs", {})
+        if not isinstance(inputs, dict):
+            raise HTTPError(400, "Field 'inputs' wajib berupa objek JSON.")
+        try:
+            grade = parse_grade(body.get("grade"))
+            if "year" in inputs:
+                inputs = {**inputs, "year": parse_vehicle_year(inputs["year"])}
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+        openrouter = self.settings.get("openrouter", {})
+        try:
+            param_variants = build_query_variants(
+                category, body.get("time_filter", "Semua Waktu"),
+                bool(body.get("use_condition_filter", True)), bool(body.get("use_url_filter", True)),
+                **inputs
+            )
+        except KeyError as e:
+            raise HTTPError(400, f"Input wajib untuk kategori {category} tidak ada: {e.args[0]}")
+        product_name = " ".join(str(value) for value in inputs.values())
+
+        harvester = SerpApiHarvester(
+            self.search_executor, get_http_session("serpapi"), openrouter.get("serpapi"),
+            self.rate_budget, cache=self.serpapi_cache
+        )
+        serpapi_data = harvester.harvest(param_variants)
+        if not serpapi_data:
+            raise HTTPError(502, "Tidak menerima data dari SerpAPI.", details=[str(e) for e in harvester.errors])
+
+        llm_model = openrouter.get("model", "")
+        token_budget = openrouter.get("context_token_budget") or context_budget_for_model(llm_model)
+        _, context_text, context_stats, estimate = summarize_search_evidence(serpapi_data, product_name, token_budget)
+        use_llm = body.get("use_llm")
+        if use_llm is None:
+            use_llm = estimate is None or not estimate.strong
+        analysis = None
+        if use_llm and context_text:
+            stream = stream_llm_non_auto(context_text, product_name, openrouter.get("api_key"), grade, llm_model)
+            analysis = "".join(stream)
+            if not stream.ok:
+                # Teks parsial tidak dikirim sebagai jawaban; estimasi statistik tetap disertakan
+                raise HTTPError(502, "Analisis AI gagal.", details=[stream.error], estimate=estimate_to_dict(estimate))
+        return {
+            "category": category,
+            "product_name": product_name,
+            "grade": grade,
+            "estimate": estimate_to_dict(estimate),
+            "context": context_stats,
+            "analysis": analysis,
+            "search_errors": [str(e) for e in harvester.errors],
+        }
+
+class PricingApp:
+    """
+    Aplikasi ASGI minimal tanpa framework web. Lookup kendaraan dijawab langsung di
+    event loop (cukup beberapa milidetik); batch dan non-otomotif dijalankan di thread.
+    """
+    def __init__(self, settings_loader=load_settings):
+        self.settings_loader = settings_loader
+        self.service = None
+        self.routes = {
+            ("GET", "/health"): (self._health, False, False),
+            ("GET", "/metrics"): (lambda body: METRICS.render_prometheus(), False, True),
+            ("POST", "/v1/mobil/quote"): (lambda body: self.service.quote("mobil", body), False, True),
+            ("POST", "/v1/motor/quote"): (lambda body: self.service.quote("motor", body), False, True),
+            ("POST", "/v1/mobil/lot"): (lambda body: self.service.price_lot("mobil", body), True, True),
+            ("POST", "/v1/motor/lot"): (lambda body: self.service.price_lot("motor", body), True, True),
+            ("POST", "/v1/non-auto/analyze"): (lambda body: self.service.analyze_non_auto(body), True, True),
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    self.service = PricingService(self.settings_loader())
+                    await asyncio.to_thread(self.service.start)
+                except Exception as e:
+                    logger.exception("Layanan harga gagal dimulai")
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if self.service is not None:
+                    self.service.search_executor.shutdown(wait=False, cancel_futures=True)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def _health(self, body):
+        # Selain "ok" dijawab 503 agar load balancer/orchestrator tidak mengirim lalu lintas ke worker ini
+        payload = self.service.health() if self.service is not None else {"status": "starting"}
+        if payload["status"] != "ok":
+            raise HTTPError(503, "Layanan belum siap atau data tidak lengkap.", **payload)
+        return payload
+
+    async def _http(self, scope, receive, send):
+        route = self.routes.get((scope["method"], scope["path"]))
+        try:
+            if route is None:
+                raise HTTPError(404, "Endpoint tidak ditemukan.")
+            handler, blocking, needs_auth = route
+            if needs_auth:
+                if self.service is None:
+                    raise HTTPError(503, "Layanan sedang dimulai.")
+                headers = {key.decode("latin-1").lower(): value.decode("latin-1") for key, value in scope["headers"]}
+                self.service.authorize(headers)
+                # Metrik permintaan ini diberi label klien API (contextvar ikut ke asyncio.to_thread)
+                current_user.set(headers.get("x-client-id", "api"))
+            body = await self._read_json(receive) if scope["method"] == "POST" else {}
+            payload = await asyncio.to_thread(handler, body) if blocking else handler(body)
+            status = 200
+        except HTTPError as e:
+            status, payload = e.status, e.body
+        except Exception as e:
+            logger.exception("Error tak terduga di %s", scope["path"])
+            status, payload = 500, {"error": f"Terjadi error internal: {e}"}
+        await self._send(send, status, payload)
+
+    async def _read_json(self, receive):
+        chunks, size = [], 0
+        while True:
+            message = await receive()
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > MAX_BODY_BYTES:
+                raise HTTPError(413, "Body permintaan terlalu besar.")
+            chunks.append(chunk)
+            if not message.get("more_body"):
+                break
+        try:
+            body = json.loads(b"".join(chunks) or b"{}")
+        except json.JSONDecodeError as e:
+            raise HTTPError(400, f"Body bukan JSON yang valid: {e}")
+        if not isinstance(body, dict):
+            raise HTTPError(400, "Body harus berupa objek JSON.")
+        return body
+
+    async def _send(self, send, status, payload):
+        # Teks (ekspor Prometheus) dikirim apa adanya, selain itu sebagai JSON
+        if isinstance(payload, str):
+            data, content_type = payload.encode("utf-8"), b"text/plain; version=0.0.4; charset=utf-8"
+        else:
+            data, content_type = json.dumps(payload, ensure_ascii=False).encode("utf-8"), b"application/json; charset=utf-8"
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", content_type), (b"content-length", str(len(data)).encode())],
+        })
+        await send({"type": "http.response.body", "body": data})
+
+app = PricingApp()